@@ -1,7 +1,10 @@
+from decimal import Decimal
+
+from django.conf import settings
 from django.contrib import admin
+from django.db.models import Case, When
 from django.http import HttpResponseRedirect
 from django.shortcuts import reverse
-from django.templatetags.static import static
 from django.utils.html import format_html
 from django.utils.http import url_has_allowed_host_and_scheme
 
@@ -11,6 +14,11 @@ from .models import Restaurant
 from .models import RestaurantMenuItem
 from .models import Order
 from .models import OrderProduct
+from .restaurant_index import nearest_restaurants_for_order
+from .thumbnails import (
+    get_thumbnail_urls, has_thumbnails, schedule_thumbnails
+)
+from places.tasks import schedule_geocoding
 
 
 class RestaurantMenuItemInline(admin.TabularInline):
@@ -39,6 +47,11 @@ class RestaurantAdmin(admin.ModelAdmin):
         RestaurantMenuItemInline
     ]
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'address' in form.changed_data:
+            schedule_geocoding(obj.address)
+
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -92,21 +105,40 @@ class ProductAdmin(admin.ModelAdmin):
     class Media:
         css = {
             "all": (
-                static("admin/foodcartapp.css")
+                "admin/foodcartapp.css",
             )
         }
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data and obj.image:
+            schedule_thumbnails(obj.image.name)
+
     def get_image_preview(self, obj):
         if not obj.image:
             return 'выберите картинку'
-        return format_html('<img src="{url}" style="max-height: 200px;"/>', url=obj.image.url)
+        if not has_thumbnails(obj):
+            return format_html('<img src="{url}" style="max-height: 200px;"/>', url=obj.image.url)
+        thumbnails = get_thumbnail_urls(obj)['medium']
+        return format_html(
+            '<picture><source srcset="{webp}" type="image/webp"/>'
+            '<img src="{jpeg}" style="max-height: 200px;"/></picture>',
+            webp=thumbnails['webp'], jpeg=thumbnails['jpeg'],
+        )
     get_image_preview.short_description = 'превью'
 
     def get_image_list_preview(self, obj):
         if not obj.image or not obj.id:
             return 'нет картинки'
         edit_url = reverse('admin:foodcartapp_product_change', args=(obj.id,))
-        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=obj.image.url)
+        if not has_thumbnails(obj):
+            return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=obj.image.url)
+        thumbnails = get_thumbnail_urls(obj)['small']
+        return format_html(
+            '<a href="{edit_url}"><picture><source srcset="{webp}" type="image/webp"/>'
+            '<img src="{jpeg}" style="max-height: 50px;"/></picture></a>',
+            edit_url=edit_url, webp=thumbnails['webp'], jpeg=thumbnails['jpeg'],
+        )
     get_image_list_preview.short_description = 'превью'
 
 
@@ -132,12 +164,72 @@ class OrderAdmin(admin.ModelAdmin):
         OrderProductInline
     ]
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'address' in form.changed_data:
+            schedule_geocoding(obj.address)
+
+    readonly_fields = [
+        'total_price',
+    ]
+
+    def get_form(self, request, obj=None, **kwargs):
+        form = super().get_form(request, obj, **kwargs)
+        if obj is not None and 'restaurant' in form.base_fields:
+            self.limit_restaurant_choices(form.base_fields['restaurant'], obj)
+        return form
+
+    def limit_restaurant_choices(self, field, order):
+        """Предложить ближайшие рестораны, способные приготовить заказ.
+
+        Пока адрес не геокодирован или рядом никого нет, выбор не
+        ограничивается.
+        """
+        nearest = nearest_restaurants_for_order(
+            order, settings.ORDER_DISPATCH_CHOICES
+        )
+        if not nearest:
+            return
+        distances = {restaurant.id: distance for distance, restaurant in nearest}
+        restaurant_ids = list(distances)
+        if order.restaurant_id and order.restaurant_id not in distances:
+            restaurant_ids.append(order.restaurant_id)
+        field.queryset = Restaurant.objects.filter(id__in=restaurant_ids).order_by(
+            Case(*[
+                When(id=restaurant_id, then=position)
+                for position, restaurant_id in enumerate(restaurant_ids)
+            ])
+        )
+        field.label_from_instance = lambda restaurant: (
+            f'{restaurant.name} — {distances[restaurant.id]:.1f} км'
+            if restaurant.id in distances else restaurant.name
+        )
+
     def save_formset(self, request, form, formset, change):
         products = formset.save(commit=False)
         for product in formset.deleted_objects:
             product.delete()
+        changed_fields = {
+            product.pk: fields for product, fields in formset.changed_objects
+        }
         for product in products:
-            if not product.price:
-                product.price = product['product'].price*product['quantity']
+            fields = changed_fields.get(product.pk, [])
+            if product.pk is None and not product.price:
+                product.price = product.product.price*product.quantity
+            elif 'price' in fields:
+                pass
+            elif 'product' in fields:
+                product.price = product.product.price*product.quantity
+            elif 'quantity' in fields:
+                # Цена позиции — это цена за штуку на момент заказа,
+                # умноженная на количество
+                old_quantity = next(
+                    inline_form.initial['quantity']
+                    for inline_form in formset.initial_forms
+                    if inline_form.instance is product
+                )
+                product.price = (
+                    product.price / old_quantity * product.quantity
+                ).quantize(Decimal('0.01'))
             product.save()
-    pass
+        Order.objects.filter(pk=form.instance.pk).recalculate_total_price()
@@ -0,0 +1,46 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.templatetags.static import static
+
+from .caching import make_key
+from .responses import dumps, prerender_json
+
+
+BANNERS_SOURCE = os.path.join(os.path.dirname(__file__), 'data', 'banners.json')
+
+
+def render_banners():
+    with open(BANNERS_SOURCE, encoding='utf-8') as source:
+        banners = json.load(source)
+    for banner in banners:
+        banner['src'] = static(banner['src'])
+    return dumps(banners)
+
+
+def get_banners():
+    """Вернуть (JSON-байты баннеров, ETag, сжатые варианты).
+
+    Берётся файл, собранный командой build_banners при деплое, а если
+    его нет — баннеры рендерятся из исходника. Результат живёт в кэше,
+    пока build_banners не соберёт баннеры заново, но не дольше
+    BANNERS_CACHE_TIMEOUT: запись с устаревшей версией пространства может
+    снова стать видимой, если кэш вытеснит счётчик версий.
+    """
+    key = make_key('banners', 'payload')
+    banners = cache.get(key)
+    if banners is None:
+        banners = load_banners()
+        cache.set(key, banners, timeout=settings.BANNERS_CACHE_TIMEOUT)
+    return banners
+
+
+def load_banners():
+    try:
+        with open(settings.BANNERS_MANIFEST, 'rb') as manifest:
+            content = manifest.read()
+    except FileNotFoundError:
+        content = render_banners()
+    return prerender_json(content)
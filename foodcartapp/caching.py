@@ -0,0 +1,78 @@
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+
+def get_initial_version():
+    # Счётчик версий может пропасть из кэша: его вытеснят при переполнении
+    # или потеряют при рестарте. Начинать заново с 1 нельзя — ожили бы
+    # старые записи с v1, поэтому новый счётчик начинается с текущего
+    # времени в миллисекундах, то есть заведомо выше прежнего
+    return int(time.time() * 1000)
+
+
+def get_namespace_version(namespace):
+    version_key = f'namespace:{namespace}:version'
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, get_initial_version(), timeout=None)
+        version = cache.get(version_key)
+    return version
+
+
+def make_key(namespace, *parts):
+    """Ключ вида «пространство:vN:части». N растёт при каждой инвалидации,
+    так что все старые ключи пространства разом становятся недостижимы."""
+    version = get_namespace_version(namespace)
+    return ':'.join([namespace, f'v{version}', *map(str, parts)])
+
+
+def invalidate_namespace(*namespaces):
+    """Сделать недостижимыми все записи пространств namespaces.
+
+    В файловом кэше incr — это get и set без блокировки, и два
+    одновременных сброса могут увеличить версию только на единицу. Это
+    не страшно: сбрасывают после коммита, так что любой запрос, увидевший
+    новую версию, уже читает из базы оба изменения.
+    """
+    for namespace in namespaces:
+        version_key = f'namespace:{namespace}:version'
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            cache.add(version_key, get_initial_version(), timeout=None)
+
+
+def cached_view(namespace, timeout=None):
+    """Кэшировать отрендеренную страницу GET-вьюхи в пространстве namespace.
+
+    В кэш кладётся только тело и тип содержимого, без заголовков и кук,
+    поэтому декоратор годится и для страниц за авторизацией — если их
+    содержимое одинаково для всех, кто туда допущен.
+    """
+    if timeout is None:
+        timeout = settings.CACHE_VIEW_TIMEOUT
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+            key = make_key(namespace, 'view', request.get_full_path())
+            cached_page = cache.get(key)
+            if cached_page is not None:
+                content, content_type = cached_page
+                return HttpResponse(content, content_type=content_type)
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(
+                    key,
+                    (response.content, response['Content-Type']),
+                    timeout,
+                )
+            return response
+        return wrapper
+    return decorator
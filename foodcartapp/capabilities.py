@@ -0,0 +1,167 @@
+import threading
+import time
+
+from django.apps import apps
+from django.core.cache import cache
+
+
+VERSION_CACHE_KEY = 'foodcartapp:capabilities_version'
+
+# Страховка от изменений в обход сигналов: bulk_create, update() и т.п.
+INDEX_TTL = 5 * 60
+
+
+def iter_bits(bitmap):
+    while bitmap:
+        lowest_bit = bitmap & -bitmap
+        yield lowest_bit.bit_length() - 1
+        bitmap ^= lowest_bit
+
+
+class CapabilitySnapshot:
+    """Маски индекса на один момент времени.
+
+    Снимок берётся один раз на запрос или операцию, и дальше все
+    проверки идут по нему без обращений к кэшу.
+    """
+
+    def __init__(self, restaurant_products, product_restaurants):
+        self.restaurant_products = restaurant_products
+        self.product_restaurants = product_restaurants
+
+    def restaurants_for(self, product_ids):
+        """Маска ресторанов, где продаются все product_ids сразу."""
+        restaurants = -1
+        for product_id in product_ids:
+            restaurants &= self.product_restaurants.get(product_id, 0)
+            if not restaurants:
+                break
+        if restaurants == -1:
+            restaurants = 0
+            for restaurant_id, products in self.restaurant_products.items():
+                if products:
+                    restaurants |= 1 << restaurant_id
+        return restaurants
+
+    def restaurant_ids_for(self, product_ids):
+        return list(iter_bits(self.restaurants_for(product_ids)))
+
+    def available_product_ids(self):
+        return [
+            product_id
+            for product_id, restaurants in self.product_restaurants.items()
+            if restaurants
+        ]
+
+
+class CapabilityIndex:
+    """Какой ресторан что продаёт, в виде битовых масок.
+
+    Для каждого ресторана хранится маска id его товаров в продаже, для
+    каждого товара — маска id ресторанов, где он продаётся. Индекс
+    загружается одним запросом и дальше обновляется по сигналам
+    RestaurantMenuItem. Другие процессы узнают об изменениях по версии
+    в кэше и перечитывают индекс из базы; изменения в обход сигналов
+    подхватываются по INDEX_TTL или через invalidate().
+
+    Версия в кэше проверяется при каждом snapshot(), поэтому для серии
+    проверок берите один снимок, а не зовите restaurants_for в цикле.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.restaurant_products = None
+        self.product_restaurants = None
+        self.version = None
+        self.loaded_at = 0
+
+    def load(self):
+        menu_items = apps.get_model('foodcartapp', 'RestaurantMenuItem').objects
+        restaurant_products = {}
+        product_restaurants = {}
+        pairs = menu_items.filter(availability=True).values_list(
+            'restaurant_id', 'product_id'
+        )
+        for restaurant_id, product_id in pairs:
+            restaurant_products[restaurant_id] = (
+                restaurant_products.get(restaurant_id, 0) | 1 << product_id
+            )
+            product_restaurants[product_id] = (
+                product_restaurants.get(product_id, 0) | 1 << restaurant_id
+            )
+        self.restaurant_products = restaurant_products
+        self.product_restaurants = product_restaurants
+        self.loaded_at = time.monotonic()
+
+    def ensure_fresh(self):
+        shared_version = cache.get(VERSION_CACHE_KEY, 0)
+        if (
+            self.restaurant_products is None
+            or shared_version != self.version
+            or time.monotonic() - self.loaded_at > INDEX_TTL
+        ):
+            self.load()
+            self.version = shared_version
+
+    def bump_version(self):
+        try:
+            new_version = cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            cache.add(VERSION_CACHE_KEY, 0, timeout=None)
+            new_version = cache.incr(VERSION_CACHE_KEY)
+        # В файловом кэше incr не атомарен: при одновременных правках меню
+        # в двух процессах оба могут получить одну версию и не узнать о
+        # правке соседа. Такое расхождение живёт не дольше INDEX_TTL
+        if new_version == (self.version or 0) + 1:
+            self.version = new_version
+        else:
+            # Кто-то ещё менял меню, пусть следующее чтение перезагрузит
+            self.restaurant_products = None
+
+    def set_availability(self, restaurant_id, product_id, available):
+        with self.lock:
+            if self.restaurant_products is not None:
+                restaurant_bit = 1 << restaurant_id
+                product_bit = 1 << product_id
+                products = self.restaurant_products.get(restaurant_id, 0)
+                restaurants = self.product_restaurants.get(product_id, 0)
+                if available:
+                    products |= product_bit
+                    restaurants |= restaurant_bit
+                else:
+                    products &= ~product_bit
+                    restaurants &= ~restaurant_bit
+                # Новые словари, а не правка на месте: выданные снимки
+                # не должны меняться у читателей под руками
+                self.restaurant_products = {
+                    **self.restaurant_products, restaurant_id: products
+                }
+                self.product_restaurants = {
+                    **self.product_restaurants, product_id: restaurants
+                }
+            self.bump_version()
+
+    def invalidate(self):
+        with self.lock:
+            self.restaurant_products = None
+            self.bump_version()
+
+    def snapshot(self):
+        """Проверить версию в кэше один раз и вернуть CapabilitySnapshot."""
+        with self.lock:
+            self.ensure_fresh()
+            return CapabilitySnapshot(
+                self.restaurant_products, self.product_restaurants
+            )
+
+    def restaurants_for(self, product_ids):
+        return self.snapshot().restaurants_for(product_ids)
+
+    def restaurant_ids_for(self, product_ids):
+        return self.snapshot().restaurant_ids_for(product_ids)
+
+    def available_product_ids(self):
+        return self.snapshot().available_product_ids()
+
+
+capability_index = CapabilityIndex()
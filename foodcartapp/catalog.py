@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import make_key
+from .models import Product
+from .responses import dumps, prerender_json
+from .thumbnails import get_thumbnail_urls
+
+
+def serialize_product(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': product.price,
+        'special_status': product.special_status,
+        'description': product.description,
+        'category': {
+            'id': product.category.id,
+            'name': product.category.name,
+        } if product.category else None,
+        'image': product.image.url,
+        'thumbnails': get_thumbnail_urls(product),
+        'restaurant': {
+            'id': product.id,
+            'name': product.name,
+        }
+    }
+
+
+def build_product_catalog():
+    products = Product.objects.select_related('category').available()
+    return prerender_json(
+        dumps([serialize_product(product) for product in products])
+    )
+
+
+def get_product_catalog():
+    """Вернуть (JSON-байты каталога, ETag, сжатые варианты).
+
+    Каталог собирается только при промахе кэша. Его сбрасывают сигналы
+    моделей, а CATALOG_CACHE_TIMEOUT страхует от изменений в обход них.
+    """
+    key = make_key('catalog', 'products')
+    catalog = cache.get(key)
+    if catalog is None:
+        catalog = build_product_catalog()
+        cache.set(key, catalog, timeout=settings.CATALOG_CACHE_TIMEOUT)
+    return catalog
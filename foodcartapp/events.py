@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+from django.db import transaction
+
+
+class OrderEventBroker:
+    """Внутрипроцессный pub/sub: будит подписчиков, когда меняются заказы.
+
+    Сами изменения подписчики читают из базы, поэтому брокер передаёт
+    только сигнал «что-то поменялось». Ждать можно и из потока (wait),
+    и из корутины (wait_async) — тогда event loop не блокируется.
+    Изменения из других процессов (например, run_order_worker)
+    подписчики увидят по таймауту ожидания.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.version = 0
+        self.async_waiters = set()
+
+    def publish(self):
+        with self.condition:
+            self.version += 1
+            self.condition.notify_all()
+            async_waiters = list(self.async_waiters)
+        for loop, event in async_waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Цикл событий уже закрыт, будить некого
+                continue
+
+    def wait(self, version, timeout):
+        """Дождаться версии новее version или таймаута, вернуть текущую."""
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.version != version, timeout=timeout
+            )
+            return self.version
+
+    async def wait_async(self, version, timeout):
+        """То же, что wait, но без блокировки event loop."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self.condition:
+            if self.version != version:
+                return self.version
+            self.async_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self.condition:
+                self.async_waiters.discard(waiter)
+        return self.version
+
+
+order_events = OrderEventBroker()
+
+
+def notify_orders_changed():
+    transaction.on_commit(order_events.publish)
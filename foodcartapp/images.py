@@ -0,0 +1,70 @@
+import contextlib
+import hashlib
+import os
+import tempfile
+
+from PIL import Image, ImageOps
+
+
+# Форматы, которые умеем пережимать, и параметры сохранения для них
+SAVE_OPTIONS = {
+    'JPEG': {'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'method': 6},
+}
+
+
+def file_sha256(path, chunk_size=1 << 16):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as image_file:
+        for chunk in iter(lambda: image_file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def optimize_image(path, max_size, quality, known_hash=None):
+    """Пережать картинку на месте: уменьшить до max_size, выкинуть EXIF
+    и прочие метаданные, сохранить с оптимизацией в том же формате.
+
+    Файл, чей хэш совпал с known_hash, не трогается. Пережатая версия
+    записывается, только если она меньше исходной или пришлось уменьшить
+    размер. Функция самодостаточна, чтобы её можно было звать в
+    отдельном процессе. Возвращает (старый размер, новый размер, хэш
+    итогового файла) или None, если файл пропущен.
+    """
+    original_hash = file_sha256(path)
+    if original_hash == known_hash:
+        return None
+    original_size = os.path.getsize(path)
+
+    with Image.open(path) as image:
+        image_format = image.format
+        if image_format not in SAVE_OPTIONS:
+            return original_size, original_size, original_hash
+        image.load()
+        optimized = ImageOps.exif_transpose(image)
+    resized = optimized.width > max_size[0] or optimized.height > max_size[1]
+    optimized.thumbnail(max_size, Image.LANCZOS)
+    if image_format == 'JPEG' and optimized.mode not in ('RGB', 'L'):
+        optimized = optimized.convert('RGB')
+
+    directory = os.path.dirname(path)
+    temp_file = tempfile.NamedTemporaryFile(dir=directory, delete=False)
+    try:
+        with temp_file:
+            optimized.save(
+                temp_file, image_format, quality=quality,
+                **SAVE_OPTIONS[image_format],
+            )
+        optimized_size = os.path.getsize(temp_file.name)
+        if not resized and optimized_size >= original_size:
+            os.remove(temp_file.name)
+            return original_size, original_size, original_hash
+        os.chmod(temp_file.name, os.stat(path).st_mode)
+        os.replace(temp_file.name, path)
+    except BaseException:
+        # Недописанный временный файл не должен остаться в MEDIA_ROOT
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temp_file.name)
+        raise
+    return original_size, optimized_size, file_sha256(path)
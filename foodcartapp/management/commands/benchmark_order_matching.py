@@ -0,0 +1,98 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from foodcartapp.capabilities import capability_index
+from foodcartapp.models import (
+    Order, OrderProduct, Product, Restaurant, RestaurantMenuItem
+)
+
+
+# (ресторанов, товаров, заказов)
+DEFAULT_SIZES = ['3x10x5', '20x50x50', '40x100x200', '100x300x1000']
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет число запросов и время подбора ресторанов для заказов '
+        'на синтетических данных. Данные создаются в транзакции и '
+        'откатываются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'sizes', nargs='*', default=DEFAULT_SIZES,
+            help='Размеры вида РЕСТОРАНЫxТОВАРЫxЗАКАЗЫ',
+        )
+        parser.add_argument('--lines', type=int, default=3, help='Позиций в заказе')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.stdout.write('рестораны x товары x заказы   запросов   секунд')
+        for size in options['sizes']:
+            restaurants, products, orders = map(int, size.split('x'))
+            queries, seconds = self.measure(
+                restaurants, products, orders, options['lines']
+            )
+            self.stdout.write(f'{size:>28} {queries:>10} {seconds:>8.3f}')
+
+    def measure(self, restaurant_count, product_count, order_count, lines):
+        try:
+            with transaction.atomic():
+                self.create_data(restaurant_count, product_count, order_count, lines)
+                # Пункты меню созданы bulk_create, без сигналов
+                capability_index.invalidate()
+                orders = Order.objects.filter(firstname='benchmark').prefetch_related('orders')
+                started_at = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    list(orders.get_restaurants_for_order())
+                seconds = time.perf_counter() - started_at
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            capability_index.invalidate()
+        return len(queries), seconds
+
+    def create_data(self, restaurant_count, product_count, order_count, lines):
+        restaurants = Restaurant.objects.bulk_create(
+            Restaurant(name=f'benchmark {number}', contact_phone='+79000000000')
+            for number in range(restaurant_count)
+        )
+        products = Product.objects.bulk_create(
+            Product(name=f'benchmark {number}', price=100, image='benchmark.jpg')
+            for number in range(product_count)
+        )
+        if not connection.features.can_return_rows_from_bulk_insert:
+            restaurants = list(Restaurant.objects.filter(name__startswith='benchmark '))
+            products = list(Product.objects.filter(name__startswith='benchmark '))
+        RestaurantMenuItem.objects.bulk_create(
+            RestaurantMenuItem(restaurant=restaurant, product=product)
+            for restaurant in restaurants
+            for product in random.sample(products, len(products) // 2)
+        )
+        orders = [
+            Order(
+                firstname='benchmark', lastname='benchmark',
+                phonenumber='+79000000000', address='benchmark',
+            )
+            for _ in range(order_count)
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Order.objects.bulk_create(orders)
+        else:
+            for order in orders:
+                order.save()
+        OrderProduct.objects.bulk_create(
+            OrderProduct(order=order, product=product, price=100)
+            for order in orders
+            for product in random.sample(products, min(lines, len(products)))
+        )
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodcartapp.banners import render_banners
+from foodcartapp.caching import invalidate_namespace
+
+
+class Command(BaseCommand):
+    help = 'Собирает JSON баннеров с адресами статики для /api/banners/'
+
+    def handle(self, *args, **options):
+        content = render_banners()
+        with open(settings.BANNERS_MANIFEST, 'wb') as manifest:
+            manifest.write(content)
+        invalidate_namespace('banners')
+        self.stdout.write(
+            f'Баннеры записаны в {settings.BANNERS_MANIFEST}'
+        )
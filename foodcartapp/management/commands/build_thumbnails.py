@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from PIL import UnidentifiedImageError
+
+from foodcartapp.models import Product
+from foodcartapp.thumbnails import create_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии картинок товаров в WebP и JPEG'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать копии, даже если они уже есть',
+        )
+
+    def handle(self, *args, **options):
+        image_names = (
+            Product.objects.exclude(image='')
+            .values_list('image', flat=True).distinct()
+        )
+        created = 0
+        failed = 0
+        for image_name in image_names.iterator():
+            try:
+                created += create_thumbnails(image_name, force=options['force'])
+            except (OSError, UnidentifiedImageError) as error:
+                failed += 1
+                self.stderr.write(f'{image_name}: {error}')
+
+        self.stdout.write(
+            f'Создано копий: {created}, картинок с ошибками: {failed}'
+        )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Order, Restaurant
+from places.geocoder import get_coordinates
+from places.models import Place
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует адреса заказов и ресторанов, которых ещё нет в Place'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        known_addresses = Place.objects.values('address')
+        pending_addresses = set(
+            Order.objects.exclude(address__in=known_addresses)
+            .values_list('address', flat=True)
+        ) | set(
+            Restaurant.objects.exclude(address__in=known_addresses)
+            .exclude(address='')
+            .values_list('address', flat=True)
+        )
+        pending_addresses = sorted(pending_addresses)
+
+        batch_size = options['batch_size']
+        found = 0
+        for start in range(0, len(pending_addresses), batch_size):
+            batch = pending_addresses[start:start + batch_size]
+            coordinates = get_coordinates(batch)
+            found += sum(1 for point in coordinates.values() if point)
+
+        self.stdout.write(
+            f'Обработано адресов: {len(pending_addresses)}, найдено: {found}'
+        )
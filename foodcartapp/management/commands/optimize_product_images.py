@@ -0,0 +1,110 @@
+import csv
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from PIL import UnidentifiedImageError
+
+from foodcartapp.images import optimize_image
+from foodcartapp.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Пережимает картинки товаров в MEDIA_ROOT: уменьшает, убирает '
+        'метаданные и пересохраняет с оптимизацией'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов, по умолчанию по числу ядер',
+        )
+        parser.add_argument(
+            '--report',
+            help='Записать в CSV, сколько байт сэкономлено на каждом файле',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Не пропускать уже обработанные файлы',
+        )
+
+    def handle(self, *args, **options):
+        manifest_path = settings.PRODUCT_IMAGES_MANIFEST
+        known_hashes = {}
+        if not options['force'] and os.path.exists(manifest_path):
+            with open(manifest_path) as manifest:
+                known_hashes = json.load(manifest)
+
+        image_names = (
+            Product.objects.exclude(image='')
+            .values_list('image', flat=True).distinct().order_by('image')
+        )
+        report_file = None
+        report = None
+        if options['report']:
+            report_file = open(options['report'], 'w', newline='')
+            report = csv.writer(report_file)
+            report.writerow(['image', 'original_bytes', 'optimized_bytes', 'saved_bytes'])
+
+        totals = {'processed': 0, 'skipped': 0, 'failed': 0, 'original': 0, 'optimized': 0}
+        try:
+            with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+                # Держим в работе не больше двух задач на процесс, чтобы
+                # не ставить в очередь разом тысячи файлов
+                max_pending = options['workers'] * 2
+                pending = {}
+                for image_name in image_names.iterator():
+                    if len(pending) >= max_pending:
+                        done = wait(pending, return_when=FIRST_COMPLETED).done
+                        self.collect(done, pending, known_hashes, report, totals)
+                    future = executor.submit(
+                        optimize_image,
+                        default_storage.path(image_name),
+                        settings.PRODUCT_IMAGE_MAX_SIZE,
+                        settings.PRODUCT_IMAGE_QUALITY,
+                        known_hashes.get(image_name),
+                    )
+                    pending[future] = image_name
+                self.collect(wait(pending).done, pending, known_hashes, report, totals)
+        finally:
+            if report_file:
+                report_file.close()
+            os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+            with open(manifest_path, 'w') as manifest:
+                json.dump(known_hashes, manifest, indent=2, sort_keys=True)
+
+        saved = totals['original'] - totals['optimized']
+        self.stdout.write(
+            f"Обработано картинок: {totals['processed']}, "
+            f"пропущено без изменений: {totals['skipped']}, "
+            f"с ошибками: {totals['failed']}. "
+            f"Было {totals['original']} байт, стало {totals['optimized']}, "
+            f"сэкономлено {saved}"
+        )
+
+    def collect(self, done, pending, known_hashes, report, totals):
+        for future in done:
+            image_name = pending.pop(future)
+            try:
+                result = future.result()
+            except (OSError, UnidentifiedImageError) as error:
+                totals['failed'] += 1
+                self.stderr.write(f'{image_name}: {error}')
+                continue
+            if result is None:
+                totals['skipped'] += 1
+                continue
+            original_size, optimized_size, image_hash = result
+            known_hashes[image_name] = image_hash
+            totals['processed'] += 1
+            totals['original'] += original_size
+            totals['optimized'] += optimized_size
+            if report:
+                report.writerow([
+                    image_name, original_size, optimized_size,
+                    original_size - optimized_size,
+                ])
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.order_status import advance_batch
+
+
+class Command(BaseCommand):
+    help = 'Периодически продвигает заказы с назначенным рестораном по кухне'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=30,
+            help='Пауза между проходами, секунд',
+        )
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Сделать один проход и выйти',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            advanced = 0
+            last_id = 0
+            # Курсор по id не даёт сдвинуть заказ дважды за один проход
+            while True:
+                orders = advance_batch(options['batch_size'], after_id=last_id)
+                advanced += len(orders)
+                if len(orders) < options['batch_size']:
+                    break
+                last_id = orders[-1].id
+            if advanced:
+                self.stdout.write(f'Продвинуто заказов: {advanced}')
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,36 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from foodcartapp.serializers import AvailabilityChangesSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Массово меняет наличие товаров в ресторанах. Принимает CSV '
+        'с колонками restaurant,product,availability'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Путь к CSV-файлу или «-» для чтения из stdin'
+        )
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            changes = list(csv.DictReader(sys.stdin))
+        else:
+            try:
+                with open(options['path'], newline='', encoding='utf-8') as csv_file:
+                    changes = list(csv.DictReader(csv_file))
+            except OSError as error:
+                raise CommandError(error)
+
+        serializer = AvailabilityChangesSerializer(data={'changes': changes})
+        if not serializer.is_valid():
+            raise CommandError(serializer.errors)
+        result = serializer.save()
+        self.stdout.write(
+            'Обновлено пунктов меню: {updated}, создано: {created}'.format(**result)
+        )
@@ -0,0 +1,51 @@
+from django.db import transaction
+
+from .models import RestaurantMenuItem
+from .signals import menu_items_changed
+
+
+def apply_availability_changes(changes):
+    """Применить пачку изменений (ресторан, товар, в продаже) одной транзакцией.
+
+    Существующие пункты меню обновляются через bulk_update, недостающие
+    создаются через bulk_create. Сигналы моделей при этом не шлются:
+    после коммита один раз отправляется menu_items_changed. Если пара
+    встречается несколько раз, побеждает последнее изменение.
+    Возвращает (обновлено, создано).
+    """
+    availability = {
+        (restaurant_id, product_id): available
+        for restaurant_id, product_id, available in changes
+    }
+    if not availability:
+        return 0, 0
+
+    restaurant_ids = {restaurant_id for restaurant_id, _ in availability}
+    product_ids = {product_id for _, product_id in availability}
+    with transaction.atomic():
+        menu_items = {
+            (menu_item.restaurant_id, menu_item.product_id): menu_item
+            for menu_item in RestaurantMenuItem.objects.select_for_update()
+            .filter(restaurant_id__in=restaurant_ids, product_id__in=product_ids)
+        }
+        changed_items = []
+        for key, menu_item in menu_items.items():
+            if key in availability and menu_item.availability != availability[key]:
+                menu_item.availability = availability[key]
+                changed_items.append(menu_item)
+        new_items = [
+            RestaurantMenuItem(
+                restaurant_id=restaurant_id,
+                product_id=product_id,
+                availability=available,
+            )
+            for (restaurant_id, product_id), available in availability.items()
+            if (restaurant_id, product_id) not in menu_items
+        ]
+        RestaurantMenuItem.objects.bulk_update(changed_items, ['availability'])
+        RestaurantMenuItem.objects.bulk_create(new_items, ignore_conflicts=True)
+        if changed_items or new_items:
+            transaction.on_commit(lambda: menu_items_changed.send(
+                sender=RestaurantMenuItem
+            ))
+    return len(changed_items), len(new_items)
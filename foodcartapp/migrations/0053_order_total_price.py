@@ -0,0 +1,19 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:56
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0052_rename_registreted_at_order_registered_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='total_price',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(0)], verbose_name='стоимость заказа'),
+        ),
+    ]
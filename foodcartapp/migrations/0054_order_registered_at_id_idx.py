@@ -0,0 +1,17 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0053_order_total_price'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['registered_at', 'id'], name='order_registered_at_id_idx'),
+        ),
+    ]
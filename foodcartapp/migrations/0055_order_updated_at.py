@@ -0,0 +1,20 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0054_order_registered_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Изменён в'),
+            preserve_default=False,
+        ),
+    ]
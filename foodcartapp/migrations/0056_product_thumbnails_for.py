@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0055_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='thumbnails_for',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='копии нарезаны для картинки'),
+        ),
+    ]
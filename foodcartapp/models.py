@@ -1,9 +1,14 @@
+from decimal import Decimal
+
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from phonenumber_field.modelfields import PhoneNumberField
-from django.db.models import F, Sum
+from django.db.models import OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from .capabilities import capability_index, iter_bits
+
 
 class Restaurant(models.Model):
     name = models.CharField(
@@ -30,36 +35,66 @@ class Restaurant(models.Model):
 
 class ProductQuerySet(models.QuerySet):
     def available(self):
-        products = (
-            RestaurantMenuItem.objects
-            .filter(availability=True)
-            .values_list('product')
-        )
-        return self.filter(pk__in=products)
+        return self.filter(pk__in=capability_index.available_product_ids())
 
 
 class OrderQuerySet(models.QuerySet):
-    def final_price(self):
-        return self.annotate(order_price=Sum(F('orders__price') * F('orders__quantity')))
+    def updated_after(self, updated_at, order_id):
+        """Заказы, изменённые после (updated_at, order_id)."""
+        return self.filter(
+            Q(updated_at__gt=updated_at)
+            | Q(updated_at=updated_at, id__gt=order_id)
+        )
+
+    def last_update(self):
+        """Вернуть (updated_at, id) последнего изменённого заказа или None."""
+        return (
+            self.order_by('-updated_at', '-id')
+            .values_list('updated_at', 'id')
+            .first()
+        )
+
+    def registered_before(self, registered_at, order_id):
+        """Заказы, идущие после (registered_at, order_id) при сортировке
+        от новых к старым."""
+        return self.filter(
+            Q(registered_at__lt=registered_at)
+            | Q(registered_at=registered_at, id__lt=order_id)
+        )
+
+    def recalculate_total_price(self):
+        order_price = (
+            OrderProduct.objects.filter(order=OuterRef('pk'))
+            .values('order')
+            .annotate(total=Sum('price'))
+            .values('total')
+        )
+        return self.update(
+            total_price=Coalesce(Subquery(order_price), Value(Decimal(0))),
+            updated_at=timezone.now(),
+        )
 
     def get_restaurants_for_order(self):
-        items = RestaurantMenuItem.objects.filter(
-            availability=True
-            ).select_related("restaurant", "product")
+        capabilities = capability_index.snapshot()
+        restaurant_masks = {}
+        for order in self:
+            order_product_ids = {
+                order_product.product_id
+                for order_product in order.orders.all()
+            }
+            restaurant_masks[order.id] = capabilities.restaurants_for(
+                order_product_ids
+            )
+        all_restaurants = 0
+        for restaurant_mask in restaurant_masks.values():
+            all_restaurants |= restaurant_mask
+        restaurants = Restaurant.objects.in_bulk(list(iter_bits(all_restaurants)))
         for order in self:
-            order_product_ids = set(
-                order.orders.values_list('product_id', flat=True)
-                )
-            restaurants = set()
-
-            for ordered_product in items:
-                restaurant_products = set(
-                    items.filter(restaurant=ordered_product.restaurant)
-                    .values_list('product_id', flat=True)
-                )
-                if order_product_ids.issubset(restaurant_products):
-                    restaurants.add(ordered_product.restaurant)
-            order.available_restaurants = list(restaurants)
+            order.available_restaurants = [
+                restaurants[restaurant_id]
+                for restaurant_id in iter_bits(restaurant_masks[order.id])
+                if restaurant_id in restaurants
+            ]
         return self
 
 
@@ -99,6 +134,12 @@ class Product(models.Model):
     image = models.ImageField(
         'картинка'
     )
+    thumbnails_for = models.CharField(
+        'копии нарезаны для картинки',
+        max_length=100,
+        blank=True,
+        editable=False,
+    )
     special_status = models.BooleanField(
         'спец.предложение',
         default=False,
@@ -149,6 +190,13 @@ class RestaurantMenuItem(models.Model):
     def __str__(self):
         return f"{self.restaurant.name} - {self.product.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        menu_item = super().from_db(db, field_names, values)
+        # Нужна индексу возможностей, если у пункта сменят ресторан или товар
+        menu_item.loaded_key = (menu_item.restaurant_id, menu_item.product_id)
+        return menu_item
+
 
 class Order(models.Model):
     class StatusCheck(models.TextChoices):
@@ -195,6 +243,14 @@ class Order(models.Model):
         'адрес',
         max_length=250
     )
+    total_price = models.DecimalField(
+        'стоимость заказа',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        db_index=True,
+        validators=[MinValueValidator(0)],
+    )
     comment = models.TextField(
         "Комментарий",
         max_length=250,
@@ -218,6 +274,11 @@ class Order(models.Model):
         blank=True,
         null=True
     )
+    updated_at = models.DateTimeField(
+        "Изменён в",
+        auto_now=True,
+        db_index=True
+    )
     restaurant = models.ForeignKey(
         Restaurant,
         on_delete=models.CASCADE,
@@ -229,6 +290,12 @@ class Order(models.Model):
     class Meta:
         verbose_name = 'заказ'
         verbose_name_plural = 'заказы в ресторане'
+        indexes = [
+            models.Index(
+                fields=['registered_at', 'id'],
+                name='order_registered_at_id_idx',
+            ),
+        ]
 
     objects = OrderQuerySet.as_manager()
 
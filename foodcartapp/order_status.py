@@ -0,0 +1,120 @@
+from django.db import connection, transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .events import notify_orders_changed
+from .models import Order
+from .signals import order_status_changed
+
+
+Status = Order.StatusCheck
+
+NEXT_STATUS = {
+    Status.CREATED: Status.IN_PROGRESS,
+    Status.IN_PROGRESS: Status.IN_KITCHEN,
+    Status.IN_KITCHEN: Status.KICTHEN_PREPARATION,
+    Status.KICTHEN_PREPARATION: Status.DELIVERED_TO_COURIER,
+    Status.DELIVERED_TO_COURIER: Status.IN_TRANSIT,
+    Status.IN_TRANSIT: Status.DELIVERED,
+    Status.DELIVERED: Status.CLOUSED,
+}
+
+# Переходы, которые не требуют участия менеджера: ресторан уже назначен,
+# значит заказ принят в обработку, а дальше он движется по кухне сам.
+AUTOMATIC_STATUSES = [
+    Status.CREATED,
+    Status.IN_PROGRESS,
+    Status.IN_KITCHEN,
+    Status.KICTHEN_PREPARATION,
+]
+
+
+# Поле, в котором запоминается момент перехода в статус
+STATUS_TIMESTAMPS = {
+    Status.IN_PROGRESS: 'called_at',
+    Status.DELIVERED: 'delivered_at',
+}
+
+# Отметки времени, которые ставят автоматические переходы
+AUTOMATIC_TIMESTAMPS = [
+    STATUS_TIMESTAMPS[NEXT_STATUS[status]]
+    for status in AUTOMATIC_STATUSES
+    if NEXT_STATUS[status] in STATUS_TIMESTAMPS
+]
+
+
+class TransitionError(Exception):
+    pass
+
+
+def advance(orders, from_status):
+    """Перевести заказы из from_status в следующий статус одним UPDATE.
+
+    Заказы, статус которых уже успел поменяться, не затрагиваются.
+    Возвращает число переведённых заказов.
+    """
+    try:
+        to_status = NEXT_STATUS[from_status]
+    except KeyError:
+        raise TransitionError(f'Из статуса {from_status} переходов нет')
+    now = timezone.now()
+    changes = {'status': to_status, 'updated_at': now}
+    timestamp_field = STATUS_TIMESTAMPS.get(to_status)
+    if timestamp_field:
+        changes[timestamp_field] = Coalesce(
+            timestamp_field, Value(now)
+        )
+    advanced = orders.filter(status=from_status).update(**changes)
+    if advanced:
+        notify_orders_changed()
+    return advanced
+
+
+def advance_automatically(orders=None):
+    """Сдвинуть на один шаг все заказы с назначенным рестораном,
+    которые кухня обрабатывает без менеджера."""
+    if orders is None:
+        orders = Order.objects.all()
+    orders = orders.filter(restaurant__isnull=False)
+    advanced = 0
+    # Идём с конца цепочки, чтобы заказ не проскочил несколько шагов за раз
+    for status in reversed(AUTOMATIC_STATUSES):
+        advanced += advance(orders, status)
+    return advanced
+
+
+def advance_batch(batch_size=100, after_id=0):
+    """Сдвинуть на шаг пачку заказов из AUTOMATIC_STATUSES с id больше after_id.
+
+    Строки блокируются на время короткой транзакции, а занятые другим
+    воркером пропускаются (где база умеет SKIP LOCKED), так что воркеров
+    можно запускать несколько. После коммита шлётся order_status_changed.
+    Возвращает список переведённых заказов.
+    """
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update(skip_locked=skip_locked)
+            .filter(
+                status__in=AUTOMATIC_STATUSES,
+                restaurant__isnull=False,
+                id__gt=after_id,
+            )
+            .order_by('id')[:batch_size]
+        )
+        now = timezone.now()
+        for order in orders:
+            order.status = NEXT_STATUS[order.status]
+            order.updated_at = now
+            timestamp_field = STATUS_TIMESTAMPS.get(order.status)
+            if timestamp_field and not getattr(order, timestamp_field):
+                setattr(order, timestamp_field, now)
+        Order.objects.bulk_update(
+            orders, ['status', 'updated_at', *AUTOMATIC_TIMESTAMPS]
+        )
+        if orders:
+            transaction.on_commit(lambda: order_status_changed.send(
+                sender=Order, orders=orders
+            ))
+    return orders
@@ -0,0 +1,93 @@
+import gzip
+import hashlib
+import json
+import re
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def dumps(data, pretty=False):
+    """Закодировать данные в JSON-байты: компактно, или с отступами при pretty.
+
+    Если установлен orjson, компактный вывод строит он. Decimal, даты
+    и ленивые строки в обоих случаях кодируются как в DjangoJSONEncoder:
+    с OPT_PASSTHROUGH_DATETIME orjson отдаёт даты в default, а не
+    кодирует их по-своему.
+    """
+    if pretty:
+        return json.dumps(
+            data, cls=DjangoJSONEncoder, ensure_ascii=False, indent=4
+        ).encode('utf-8')
+    if orjson is not None:
+        return orjson.dumps(
+            data,
+            default=DjangoJSONEncoder().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+    return json.dumps(
+        data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+def compress(content):
+    """Заранее сжать ответ всеми доступными алгоритмами."""
+    encodings = {'gzip': gzip.compress(content)}
+    if brotli is not None:
+        encodings['br'] = brotli.compress(content)
+    return encodings
+
+
+def prerender_json(content):
+    """Подготовить JSON-байты к отдаче: (байты, слабый ETag, сжатые варианты)."""
+    etag = 'W/"{}"'.format(hashlib.md5(content).hexdigest())
+    return content, etag, compress(content)
+
+
+def wants_pretty(request):
+    return request.GET.get('pretty', '').lower() in ('1', 'true', 'yes')
+
+
+def json_response(request, content, encodings=None, **kwargs):
+    """Отдать готовые JSON-байты, выбрав сжатый вариант по Accept-Encoding."""
+    response = HttpResponse(content_type='application/json', **kwargs)
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    for encoding in ('br', 'gzip'):
+        if encodings and encoding in encodings and re.search(
+            r'\b{}\b'.format(encoding), accept_encoding
+        ):
+            content = encodings[encoding]
+            response['Content-Encoding'] = encoding
+            break
+    response.content = content
+    if encodings:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def prerendered_json_response(request, content, etag, encodings=None):
+    """Ответ из заранее закодированного JSON с поддержкой If-None-Match.
+
+    Не требует ни базы, ни кэша, поэтому годится и для async-вьюх.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        if wants_pretty(request):
+            response = json_response(
+                request, dumps(json.loads(content), pretty=True)
+            )
+        else:
+            response = json_response(request, content, encodings)
+    response['ETag'] = etag
+    return response
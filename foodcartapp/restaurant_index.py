@@ -0,0 +1,67 @@
+import threading
+import time
+
+from places.geocoder import get_coordinates
+from places.spatial import GridIndex
+
+from .capabilities import capability_index
+from .models import Restaurant
+
+
+# Координаты ресторанов дописываются геокодером в фоне без сигналов,
+# поэтому индекс пересобирается ещё и по таймауту
+INDEX_TTL = 5 * 60
+
+index_lock = threading.Lock()
+restaurant_index = None
+built_at = 0
+
+
+def build_restaurant_index():
+    restaurants = list(Restaurant.objects.exclude(address=''))
+    coordinates = get_coordinates(
+        [restaurant.address for restaurant in restaurants],
+        fetch_missing=False,
+    )
+    return GridIndex(
+        (coordinates[restaurant.address], restaurant)
+        for restaurant in restaurants
+        if coordinates.get(restaurant.address)
+    )
+
+
+def get_restaurant_index():
+    global restaurant_index, built_at
+    with index_lock:
+        if restaurant_index is None or time.monotonic() - built_at > INDEX_TTL:
+            restaurant_index = build_restaurant_index()
+            built_at = time.monotonic()
+        return restaurant_index
+
+
+def invalidate_restaurant_index():
+    global restaurant_index
+    with index_lock:
+        restaurant_index = None
+
+
+def nearest_restaurants(point, k, product_ids=()):
+    """До k ближайших к точке (широта, долгота) ресторанов, в которых
+    сейчас продаются все product_ids. Возвращает пары (км, ресторан)."""
+    capable_restaurants = capability_index.restaurants_for(product_ids)
+    return get_restaurant_index().nearest(
+        point, k,
+        predicate=lambda restaurant: capable_restaurants >> restaurant.id & 1,
+    )
+
+
+def nearest_restaurants_for_order(order, k):
+    """До k ближайших ресторанов, которые могут приготовить весь заказ.
+
+    Возвращает None, если координаты адреса заказа ещё неизвестны.
+    """
+    point = get_coordinates([order.address], fetch_missing=False).get(order.address)
+    if point is None:
+        return None
+    product_ids = order.orders.values_list('product_id', flat=True)
+    return nearest_restaurants(point, k, product_ids)
@@ -1,9 +1,119 @@
-from rest_framework.serializers import ModelSerializer, ListField
+from django.db import connection
+from rest_framework.fields import empty
+from rest_framework.serializers import (
+    BooleanField, IntegerField, ListField, ModelSerializer,
+    PrimaryKeyRelatedField, Serializer, ValidationError
+)
 
-from foodcartapp.models import Order, OrderProduct
+from foodcartapp.capabilities import capability_index
+from foodcartapp.events import notify_orders_changed
+from foodcartapp.menu import apply_availability_changes
+from foodcartapp.models import Order, OrderProduct, Product, Restaurant
+from places.tasks import schedule_geocoding
+
+
+def collect_product_ids(orders_data):
+    product_ids = set()
+    for order_data in orders_data:
+        if not isinstance(order_data, dict):
+            continue
+        products = order_data.get('products')
+        if not isinstance(products, list):
+            continue
+        for product in products:
+            if not isinstance(product, dict):
+                continue
+            try:
+                product_ids.add(int(product.get('product')))
+            except (TypeError, ValueError):
+                continue
+    return product_ids
+
+
+def load_products(orders_data):
+    """Загрузить одним запросом все товары, упомянутые в сырых данных заказов."""
+    return Product.objects.in_bulk(collect_product_ids(orders_data))
+
+
+def create_orders(orders_data):
+    """Сохранить провалидированные заказы вместе с их позициями.
+
+    Где база возвращает id из bulk_create (PostgreSQL), число запросов
+    не зависит от количества заказов.
+    """
+    orders = [
+        Order(
+            firstname=order_data['firstname'],
+            lastname=order_data['lastname'],
+            phonenumber=order_data['phonenumber'],
+            address=order_data['address'],
+            total_price=sum(
+                product['product'].price*product['quantity']
+                for product in order_data['products']
+            )
+        )
+        for order_data in orders_data
+    ]
+    if connection.features.can_return_rows_from_bulk_insert:
+        Order.objects.bulk_create(orders)
+    else:
+        for order in orders:
+            order.save()
+
+    order_products = [
+        OrderProduct(
+            product=product["product"],
+            order=order,
+            price=product['product'].price*product['quantity'],
+            quantity=product["quantity"]
+        )
+        for order, order_data in zip(orders, orders_data)
+        for product in order_data['products']
+    ]
+    OrderProduct.objects.bulk_create(order_products)
+    schedule_geocoding(*{order.address for order in orders})
+    notify_orders_changed()
+    return orders
+
+
+class ProductField(PrimaryKeyRelatedField):
+    """Товар по id, который сейчас есть в продаже.
+
+    Если в context['products'] уже лежат товары из load_products, поиск
+    идёт по ним, без запроса в базу. Наличие проверяется по снимку
+    индекса из context['capabilities'], если он есть.
+    """
+
+    default_error_messages = {
+        'unavailable': 'Товар "{pk_value}" сейчас не продаётся.',
+    }
+
+    def to_internal_value(self, data):
+        products = self.context.get('products')
+        if products is None:
+            product = super().to_internal_value(data)
+        else:
+            product = self.get_loaded_product(products, data)
+        capabilities = self.context.get('capabilities') or capability_index
+        if not capabilities.restaurants_for([product.id]):
+            self.fail('unavailable', pk_value=data)
+        return product
+
+    def get_loaded_product(self, products, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            product = products.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if product is None:
+            self.fail('does_not_exist', pk_value=data)
+        return product
 
 
 class OrderProductSerializer(ModelSerializer):
+    product = ProductField(queryset=Product.objects.all())
+
     class Meta:
         model = OrderProduct
         fields = [
@@ -24,21 +134,66 @@ class OrderSerializer(ModelSerializer):
             'phonenumber', 'address', 'products'
         ]
 
+    def __init__(self, instance=None, data=empty, **kwargs):
+        if data is not empty:
+            context = dict(kwargs.get('context', {}))
+            if 'products' not in context:
+                context['products'] = load_products([data])
+            if 'capabilities' not in context:
+                context['capabilities'] = capability_index.snapshot()
+            kwargs['context'] = context
+        super().__init__(instance, data, **kwargs)
+
     def create(self, validated_data):
-        order = Order.objects.create(
-            firstname=validated_data['firstname'],
-            lastname=validated_data['lastname'],
-            phonenumber=validated_data['phonenumber'],
-            address=validated_data['address']
-            )
-        order_products = [
-            OrderProduct(
-                product=product["product"],
-                order=order,
-                price=product['product'].price*product['quantity'],
-                quantity=product["quantity"]
-            )
-            for product in validated_data['products']
-        ]
-        OrderProduct.objects.bulk_create(order_products)
+        order, = create_orders([validated_data])
         return order
+
+
+class AvailabilityChangeSerializer(Serializer):
+    restaurant = IntegerField()
+    product = IntegerField()
+    availability = BooleanField()
+
+
+class AvailabilityChangesSerializer(Serializer):
+    """Пачка изменений наличия товаров в ресторанах.
+
+    Существование ресторанов и товаров проверяется двумя запросами на
+    всю пачку, а не по запросу на строку.
+    """
+
+    changes = ListField(
+        child=AvailabilityChangeSerializer(),
+        allow_empty=False
+    )
+
+    def validate_changes(self, changes):
+        restaurant_ids = {change['restaurant'] for change in changes}
+        product_ids = {change['product'] for change in changes}
+        unknown_restaurants = restaurant_ids - set(
+            Restaurant.objects.filter(id__in=restaurant_ids)
+            .values_list('id', flat=True)
+        )
+        unknown_products = product_ids - set(
+            Product.objects.filter(id__in=product_ids)
+            .values_list('id', flat=True)
+        )
+        errors = []
+        if unknown_restaurants:
+            errors.append('Нет ресторанов с id: {}'.format(
+                ', '.join(map(str, sorted(unknown_restaurants)))
+            ))
+        if unknown_products:
+            errors.append('Нет товаров с id: {}'.format(
+                ', '.join(map(str, sorted(unknown_products)))
+            ))
+        if errors:
+            raise ValidationError(errors)
+        return changes
+
+    def create(self, validated_data):
+        updated, created = apply_availability_changes(
+            (change['restaurant'], change['product'], change['availability'])
+            for change in validated_data['changes']
+        )
+        return {'updated': updated, 'created': created}
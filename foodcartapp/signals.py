@@ -0,0 +1,94 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .capabilities import capability_index
+from .caching import invalidate_namespace
+from .events import notify_orders_changed
+from .models import (
+    Order, Product, ProductCategory, Restaurant, RestaurantMenuItem
+)
+from .restaurant_index import invalidate_restaurant_index
+
+
+# Шлётся с аргументом orders — заказами, у которых сменился статус
+order_status_changed = Signal()
+
+# Шлётся после массового изменения пунктов меню в обход save()
+menu_items_changed = Signal()
+
+
+# Какие пространства кэша устаревают при изменении модели
+CACHE_NAMESPACES = {
+    Product: ['catalog', 'menu'],
+    ProductCategory: ['catalog', 'menu'],
+    RestaurantMenuItem: ['catalog', 'menu'],
+    Restaurant: ['menu', 'restaurants'],
+}
+
+
+def invalidate_cached_namespaces(sender, **kwargs):
+    # До коммита параллельный запрос ещё видит старые данные и положил
+    # бы их в кэш уже под новой версией
+    transaction.on_commit(
+        lambda: invalidate_namespace(*CACHE_NAMESPACES[sender])
+    )
+
+
+# Пункты меню сбрасывают кэш сами, после обновления индекса возможностей:
+# иначе запрос между двумя шагами соберёт каталог по старым маскам и
+# положит его под новую версию
+for model in CACHE_NAMESPACES:
+    if model is RestaurantMenuItem:
+        continue
+    post_save.connect(invalidate_cached_namespaces, sender=model)
+    post_delete.connect(invalidate_cached_namespaces, sender=model)
+
+
+def invalidate_menu_namespaces():
+    invalidate_namespace(*CACHE_NAMESPACES[RestaurantMenuItem])
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def reset_restaurant_index(sender, **kwargs):
+    invalidate_restaurant_index()
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+def update_capabilities(sender, instance, **kwargs):
+    loaded_key = getattr(instance, 'loaded_key', None)
+    current_key = (instance.restaurant_id, instance.product_id)
+
+    def apply_changes():
+        if loaded_key and loaded_key != current_key:
+            capability_index.set_availability(*loaded_key, False)
+        capability_index.set_availability(*current_key, instance.availability)
+        invalidate_menu_namespaces()
+
+    transaction.on_commit(apply_changes)
+    instance.loaded_key = current_key
+
+
+@receiver(post_delete, sender=RestaurantMenuItem)
+def remove_capability(sender, instance, **kwargs):
+    def apply_changes():
+        capability_index.set_availability(
+            instance.restaurant_id, instance.product_id, False
+        )
+        invalidate_menu_namespaces()
+
+    transaction.on_commit(apply_changes)
+
+
+@receiver(menu_items_changed, sender=RestaurantMenuItem)
+def reload_capabilities(sender, **kwargs):
+    capability_index.invalidate()
+    invalidate_menu_namespaces()
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(order_status_changed, sender=Order)
+def publish_order_changes(sender, **kwargs):
+    notify_orders_changed()
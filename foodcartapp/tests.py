@@ -0,0 +1,68 @@
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from . import signals
+from .capabilities import capability_index
+from .catalog import get_product_catalog
+from .menu import apply_availability_changes
+from .models import Product, Restaurant, RestaurantMenuItem
+
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MenuInvalidationOrderTest(TestCase):
+    """Кэш каталога сбрасывается только после обновления индекса возможностей.
+
+    Сразу после сброса каталог пересобирается — как это сделал бы
+    параллельный запрос — и в нём уже должен быть новый товар.
+    """
+
+    def setUp(self):
+        cache.clear()
+        capability_index.invalidate()
+        self.restaurant = Restaurant.objects.create(name='Бургерная', address='Москва')
+        self.product = Product.objects.create(name='Бургер', price=100, image='x.jpg')
+        self.catalogs_after_invalidation = []
+
+        invalidate_namespace = signals.invalidate_namespace
+
+        def invalidate_and_rebuild(*namespaces):
+            invalidate_namespace(*namespaces)
+            content, _, _ = get_product_catalog()
+            self.catalogs_after_invalidation.append(
+                [product['id'] for product in json.loads(content)]
+            )
+
+        patcher = mock.patch.object(
+            signals, 'invalidate_namespace', side_effect=invalidate_and_rebuild
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assert_catalog_has_product(self):
+        self.assertTrue(self.catalogs_after_invalidation)
+        for product_ids in self.catalogs_after_invalidation:
+            self.assertIn(self.product.id, product_ids)
+        content, _, _ = get_product_catalog()
+        self.assertIn(self.product.id, [product['id'] for product in json.loads(content)])
+
+    def test_menu_item_saved(self):
+        self.assertEqual(json.loads(get_product_catalog()[0]), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantMenuItem.objects.create(
+                restaurant=self.restaurant, product=self.product, availability=True
+            )
+        self.assert_catalog_has_product()
+
+    def test_bulk_availability_changes(self):
+        self.assertEqual(json.loads(get_product_catalog()[0]), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_availability_changes([(self.restaurant.id, self.product.id, True)])
+        self.assert_catalog_has_product()
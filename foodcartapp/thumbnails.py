@@ -0,0 +1,135 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .caching import invalidate_namespace
+from .models import Product
+
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thumbnails')
+
+THUMBNAIL_FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+
+def get_thumbnail_name(image_name, size_name, extension):
+    """Путь копии рядом с оригиналом: dir/thumbnails/имя_размер.расширение."""
+    directory, filename = posixpath.split(image_name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(
+        directory, 'thumbnails', f'{stem}_{size_name}.{extension}'
+    )
+
+
+def has_thumbnails(product):
+    return bool(product.image) and product.thumbnails_for == product.image.name
+
+
+def get_thumbnail_urls(product):
+    """{размер: {формат: url}} для всех копий картинки товара.
+
+    Пока копии текущей картинки не нарезаны, словарь пустой. Адреса
+    вычисляются по имени файла, без обращения к хранилищу.
+    """
+    if not has_thumbnails(product):
+        return {}
+    return {
+        size_name: {
+            extension: default_storage.url(
+                get_thumbnail_name(product.image.name, size_name, extension)
+            )
+            for extension in THUMBNAIL_FORMATS
+        }
+        for size_name in settings.PRODUCT_THUMBNAIL_SIZES
+    }
+
+
+def render_thumbnail(image, size, image_format):
+    thumbnail = ImageOps.exif_transpose(image)
+    thumbnail.thumbnail(size, Image.LANCZOS)
+    if image_format == 'JPEG' and thumbnail.mode != 'RGB':
+        background = Image.new('RGB', thumbnail.size, 'white')
+        thumbnail = thumbnail.convert('RGBA')
+        background.paste(thumbnail, mask=thumbnail.getchannel('A'))
+        thumbnail = background
+    output = BytesIO()
+    thumbnail.save(
+        output, image_format,
+        quality=settings.PRODUCT_THUMBNAIL_QUALITY, optimize=True,
+    )
+    return output.getvalue()
+
+
+def create_thumbnails(image_name, force=False):
+    """Создать недостающие копии картинки, с force=True — пересоздать все,
+    и отметить у товаров с этой картинкой, что копии готовы.
+
+    Возвращает число записанных файлов.
+    """
+    missing = [
+        (size_name, size, extension)
+        for size_name, size in settings.PRODUCT_THUMBNAIL_SIZES.items()
+        for extension in THUMBNAIL_FORMATS
+        if force or not default_storage.exists(
+            get_thumbnail_name(image_name, size_name, extension)
+        )
+    ]
+    if not missing:
+        mark_thumbnails_ready(image_name)
+        return 0
+
+    with default_storage.open(image_name) as image_file:
+        image = Image.open(image_file)
+        image.load()
+
+    for size_name, size, extension in missing:
+        thumbnail_name = get_thumbnail_name(image_name, size_name, extension)
+        content = render_thumbnail(image, size, THUMBNAIL_FORMATS[extension])
+        default_storage.delete(thumbnail_name)
+        default_storage.save(thumbnail_name, ContentFile(content))
+    mark_thumbnails_ready(image_name)
+    return len(missing)
+
+
+def mark_thumbnails_ready(image_name):
+    updated = (
+        Product.objects.filter(image=image_name)
+        .exclude(thumbnails_for=image_name)
+        .update(thumbnails_for=image_name)
+    )
+    # update() не шлёт сигналов, а каталог отдаёт адреса копий
+    if updated:
+        invalidate_namespace('catalog')
+
+
+def create_thumbnails_safely(image_names):
+    try:
+        for image_name in image_names:
+            try:
+                create_thumbnails(image_name)
+            except Exception:
+                logger.exception('Не удалось создать копии картинки %s', image_name)
+    finally:
+        connection.close()
+
+
+def schedule_thumbnails(*image_names):
+    """Нарезать копии картинок в фоне, после коммита текущей транзакции.
+
+    Если процесс завершится раньше, недостающие копии создаст команда
+    `python manage.py build_thumbnails`.
+    """
+    transaction.on_commit(
+        lambda: executor.submit(create_thumbnails_safely, image_names)
+    )
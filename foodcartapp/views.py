@@ -1,61 +1,34 @@
-from django.http import JsonResponse
-from django.templatetags.static import static
-from rest_framework.decorators import api_view
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 
-from foodcartapp.serializers import OrderSerializer
-from .models import Product
+from foodcartapp.serializers import (
+    AvailabilityChangesSerializer, OrderSerializer, create_orders,
+    load_products
+)
+from .banners import get_banners
+from .capabilities import capability_index
+from .catalog import get_product_catalog
+from .responses import prerendered_json_response
 from rest_framework.response import Response
 from django.db import transaction
 
 
-def banners_list_api(request):
-    return JsonResponse([
-        {
-            'title': 'Burger',
-            'src': static('burger.jpg'),
-            'text': 'Tasty Burger at your door step',
-        },
-        {
-            'title': 'Spices',
-            'src': static('food.jpg'),
-            'text': 'All Cuisines',
-        },
-        {
-            'title': 'New York',
-            'src': static('tasty.jpg'),
-            'text': 'Food is incomplete without a tasty dessert',
-        }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+async def banners_list_api(request):
+    content, etag, encodings = await sync_to_async(get_banners)()
+    response = prerendered_json_response(request, content, etag, encodings)
+    patch_cache_control(
+        response, public=True, max_age=settings.BANNERS_CACHE_MAX_AGE
+    )
+    return response
 
 
-def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+async def product_list_api(request):
+    content, etag, encodings = await sync_to_async(get_product_catalog)()
+    return prerendered_json_response(request, content, etag, encodings)
 
 
 @transaction.atomic
@@ -63,4 +36,46 @@ def product_list_api(request):
 def register_order(request):
     serializer = OrderSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
+    serializer.save()
     return Response(serializer.data)
+
+
+@transaction.atomic
+@api_view(['POST'])
+def register_orders_bulk(request):
+    if not isinstance(request.data, list):
+        return Response(
+            {'error': 'Ожидается список заказов'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    context = {
+        'products': load_products(request.data),
+        'capabilities': capability_index.snapshot(),
+    }
+    serializers = [
+        OrderSerializer(data=order_data, context=context)
+        for order_data in request.data
+    ]
+    valid_serializers = [
+        serializer for serializer in serializers if serializer.is_valid()
+    ]
+    orders = create_orders([
+        serializer.validated_data for serializer in valid_serializers
+    ])
+    for serializer, order in zip(valid_serializers, orders):
+        serializer.instance = order
+
+    results = [
+        {'order': serializer.data}
+        if serializer.instance else {'errors': serializer.errors}
+        for serializer in serializers
+    ]
+    return Response({'results': results})
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def update_menu_availability(request):
+    serializer = AvailabilityChangesSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return Response(serializer.save())
@@ -0,0 +1,54 @@
+import numpy as np
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_radians(points):
+    """Список (широта, долгота) или None -> массив N×2 в радианах, None -> NaN."""
+    coordinates = np.array(
+        [point if point is not None else (np.nan, np.nan) for point in points],
+        dtype=float,
+    ).reshape(-1, 2)
+    return np.radians(coordinates)
+
+
+def distance_matrix(from_points, to_points):
+    """Расстояния в км между всеми парами точек по формуле гаверсинуса.
+
+    Для точек без координат в матрице стоит NaN.
+    """
+    from_points = to_radians(from_points)
+    to_points = to_radians(to_points)
+    from_lat = from_points[:, 0, np.newaxis]
+    from_lon = from_points[:, 1, np.newaxis]
+    to_lat = to_points[np.newaxis, :, 0]
+    to_lon = to_points[np.newaxis, :, 1]
+
+    haversine = (
+        np.sin((to_lat - from_lat) / 2) ** 2
+        + np.cos(from_lat) * np.cos(to_lat)
+        * np.sin((to_lon - from_lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(haversine, 0, 1)))
+
+
+def sort_by_distance(distances, allowed_columns=None):
+    """Для каждой строки матрицы вернуть индексы столбцов от ближнего к дальнему.
+
+    allowed_columns — по списку допустимых столбцов на каждую строку,
+    остальные отбрасываются. Столбцы с неизвестным расстоянием (NaN)
+    идут в конце.
+    """
+    if allowed_columns is None:
+        mask = np.ones(distances.shape, dtype=bool)
+    else:
+        mask = np.zeros(distances.shape, dtype=bool)
+        for row, columns in enumerate(allowed_columns):
+            mask[row, list(columns)] = True
+    sort_keys = np.where(mask, np.nan_to_num(distances, nan=np.inf), np.nan)
+    sorted_columns = np.argsort(sort_keys, axis=1, kind='stable')
+    return [
+        columns[:count].tolist()
+        for columns, count in zip(sorted_columns, mask.sum(axis=1))
+    ]
@@ -0,0 +1,231 @@
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from places.models import Place
+
+
+YANDEX_GEOCODER_URL = "https://geocode-maps.yandex.ru/1.x"
+
+logger = logging.getLogger(__name__)
+
+
+class GeocodingError(Exception):
+    pass
+
+
+def parse_coordinates(geocoder_response):
+    found_places = geocoder_response['response']['GeoObjectCollection']['featureMember']
+
+    if not found_places:
+        return None
+
+    most_relevant = found_places[0]
+    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+    return lon, lat
+
+
+class CircuitBreaker:
+    """После failure_threshold ошибок подряд перестаёт пускать запросы
+    на reset_timeout секунд, затем пропускает пробный запрос."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        with self.lock:
+            return (
+                self.opened_at is not None
+                and time.monotonic() - self.opened_at < self.reset_timeout
+            )
+
+    def check(self):
+        if self.is_open:
+            raise GeocodingError('Геокодер временно отключён после серии ошибок')
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class RateLimiter:
+    """Раздаёт слоты для запросов не чаще rate в секунду на процесс."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.next_slot = 0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Занять ближайший слот и вернуть, сколько секунд до него ждать."""
+        if not self.rate:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + 1 / self.rate
+            return slot - now
+
+
+class YandexGeocoder:
+    """Клиент Яндекс-геокодера с пулом соединений, таймаутами,
+    повторами с нарастающей паузой и предохранителем."""
+
+    def __init__(self, apikey=None, connect_timeout=3.05, read_timeout=10,
+                 retries=2, backoff_factor=0.5, breaker=None):
+        self.apikey = apikey
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(max_retries=Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET'],
+        ))
+        self.session.mount('https://', adapter)
+
+    def get_params(self, address):
+        return {
+            "geocode": address,
+            "apikey": self.apikey or settings.YANDEX_API_KEY,
+            "format": "json",
+        }
+
+    def __call__(self, address):
+        self.breaker.check()
+        try:
+            response = self.session.get(
+                YANDEX_GEOCODER_URL,
+                params=self.get_params(address),
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            coordinates = parse_coordinates(response.json())
+        except requests.RequestException as error:
+            self.breaker.record_failure()
+            raise GeocodingError(error) from error
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as error:
+            # Ответ пришёл, но не того вида: не JSON или без нужных полей
+            self.breaker.record_failure()
+            raise GeocodingError(f'Неожиданный ответ геокодера: {error!r}') from error
+        self.breaker.record_success()
+        return coordinates
+
+
+yandex_geocoder = YandexGeocoder()
+rate_limiter = RateLimiter(settings.GEOCODER_RATE_LIMIT)
+
+
+def fetch_yandex_coordinates(address):
+    return yandex_geocoder(address)
+
+
+def fetch_stub_coordinates(address):
+    """Детерминированные координаты в окрестностях Москвы, без сети."""
+    digest = hashlib.md5(address.encode('utf-8')).digest()
+    lon = 37.3 + digest[0] / 255 * 0.6
+    lat = 55.5 + digest[1] / 255 * 0.4
+    return lon, lat
+
+
+def get_geocoder():
+    return import_string(settings.GEOCODER)
+
+
+def get_coordinates(addresses, geocoder=None, fetch_missing=True):
+    """Вернуть {адрес: (широта, долгота) или None}, сохраняя ответы в Place.
+
+    С fetch_missing=False геокодер не вызывается: неизвестные адреса
+    просто получают None.
+    """
+    addresses = {address for address in addresses if address}
+    places = load_places(addresses)
+
+    missing_addresses = addresses - places.keys() if fetch_missing else set()
+    found_coordinates = {}
+    if missing_addresses:
+        found_coordinates = geocode_concurrently(
+            missing_addresses, geocoder or get_geocoder()
+        )
+    places.update(save_places(found_coordinates))
+    return format_coordinates(addresses, places)
+
+
+def geocode_concurrently(addresses, geocoder):
+    """Геокодировать адреса параллельно, не больше GEOCODER_CONCURRENCY
+    запросов одновременно и GEOCODER_RATE_LIMIT запросов в секунду.
+
+    Адреса, на которых геокодер упал, в результат не попадают; ошибка
+    на одном адресе не мешает сохранить остальные.
+    """
+    def geocode(address):
+        time.sleep(rate_limiter.reserve())
+        return geocoder(address)
+
+    addresses = list(addresses)
+    found_coordinates = {}
+    max_workers = min(settings.GEOCODER_CONCURRENCY, len(addresses))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(geocode, address): address
+            for address in addresses
+        }
+        for future in as_completed(futures):
+            try:
+                found_coordinates[futures[future]] = future.result()
+            except GeocodingError as error:
+                logger.warning('Не удалось геокодировать адрес %s: %s', futures[future], error)
+            except Exception:
+                logger.exception('Не удалось геокодировать адрес %s', futures[future])
+    return found_coordinates
+
+
+def load_places(addresses):
+    return {
+        place.address: place
+        for place in Place.objects.filter(address__in=addresses)
+    }
+
+
+def save_places(found_coordinates):
+    """Записать ответы геокодера в Place, включая ненайденные адреса."""
+    new_places = []
+    for address, coordinates in found_coordinates.items():
+        lon, lat = coordinates if coordinates else (None, None)
+        new_places.append(
+            Place(address=address, longitude=lon, latitude=lat)
+        )
+    Place.objects.bulk_create(new_places, ignore_conflicts=True)
+    return {place.address: place for place in new_places}
+
+
+def format_coordinates(addresses, places):
+    return {
+        address: (
+            (float(places[address].latitude), float(places[address].longitude))
+            if address in places and places[address].latitude is not None
+            else None
+        )
+        for address in addresses
+    }
@@ -0,0 +1,63 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from geopy.distance import geodesic
+
+from places.distance import distance_matrix, sort_by_distance
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает матрицу расстояний places.distance с попарным '
+        'geopy.geodesic на случайных точках в окрестностях Москвы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--restaurants', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        orders = self.random_points(options['orders'])
+        restaurants = self.random_points(options['restaurants'])
+
+        started_at = time.perf_counter()
+        geodesic_distances = [
+            [geodesic(order, restaurant).km for restaurant in restaurants]
+            for order in orders
+        ]
+        geodesic_nearest = [
+            sorted(range(len(restaurants)), key=row.__getitem__)
+            for row in geodesic_distances
+        ]
+        geodesic_seconds = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        distances = distance_matrix(orders, restaurants)
+        matrix_nearest = sort_by_distance(distances)
+        matrix_seconds = time.perf_counter() - started_at
+
+        relative_error = np.abs(
+            distances - np.array(geodesic_distances)
+        ) / np.array(geodesic_distances)
+        same_nearest = sum(
+            geodesic_row[0] == matrix_row[0]
+            for geodesic_row, matrix_row in zip(geodesic_nearest, matrix_nearest)
+        )
+        self.stdout.write(
+            f"{options['orders']} заказов x {options['restaurants']} ресторанов\n"
+            f'geodesic по парам: {geodesic_seconds:.3f} с\n'
+            f'матрица NumPy: {matrix_seconds:.3f} с '
+            f'(в {geodesic_seconds / matrix_seconds:.0f} раз быстрее)\n'
+            f'наибольшая относительная ошибка: {relative_error.max():.2%}\n'
+            f'ближайший ресторан совпал у {same_nearest} из {len(orders)} заказов'
+        )
+
+    def random_points(self, count):
+        return [
+            (55.5 + random.random() * 0.4, 37.3 + random.random() * 0.6)
+            for _ in range(count)
+        ]
@@ -0,0 +1,120 @@
+import heapq
+import math
+from collections import defaultdict
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.radians(EARTH_RADIUS_KM)
+
+
+def haversine_km(point, other_point):
+    lat, lon = map(math.radians, point)
+    other_lat, other_lon = map(math.radians, other_point)
+    haversine = (
+        math.sin((other_lat - lat) / 2) ** 2
+        + math.cos(lat) * math.cos(other_lat)
+        * math.sin((other_lon - lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(haversine, 1)))
+
+
+class GridIndex:
+    """Равномерная сетка по координатам для поиска ближайших точек.
+
+    Точки раскладываются по ячейкам примерно cell_size_km на
+    cell_size_km, а поиск обходит кольца ячеек вокруг запроса, пока
+    следующие кольца не могут дать ничего ближе уже найденного.
+    """
+
+    def __init__(self, items, cell_size_km=2):
+        """items — пары ((широта, долгота), значение)."""
+        items = list(items)
+        self.cell_size_km = cell_size_km
+        mean_lat = (
+            sum(point[0] for point, _ in items) / len(items) if items else 0
+        )
+        self.lat_step = cell_size_km / KM_PER_DEGREE
+        self.lon_step = self.lat_step / max(math.cos(math.radians(mean_lat)), 0.01)
+        # Ячейка по долготе сужается к полюсам, для оценки расстояний
+        # нужна самая узкая из тех, где лежат точки
+        self.max_abs_lat = max((abs(point[0]) for point, _ in items), default=0)
+        self.cells = defaultdict(list)
+        for point, value in items:
+            self.cells[self.get_cell(point)].append((point, value))
+        # Границы занятых ячеек: дальше них кольца искать незачем
+        rows = [row for row, _ in self.cells]
+        cols = [col for _, col in self.cells]
+        self.bounds = (
+            (min(rows), max(rows), min(cols), max(cols)) if self.cells else None
+        )
+
+    def __len__(self):
+        return sum(len(cell) for cell in self.cells.values())
+
+    def get_cell(self, point):
+        lat, lon = point
+        return math.floor(lat / self.lat_step), math.floor(lon / self.lon_step)
+
+    def get_ring_distance_km(self, radius, lat):
+        """Нижняя граница расстояния от точки на широте lat до точек,
+        которые лежат дальше radius колец от её ячейки."""
+        by_lat = radius * self.cell_size_km
+        # Разница долгот больше radius * lon_step, а широта обеих точек
+        # по модулю не больше max_lat. Ближе всего такие точки на
+        # параллели max_lat, и там их разделяет дуга большого круга
+        max_lat = math.radians(max(self.max_abs_lat, abs(lat)))
+        lon_diff = min(math.radians(radius * self.lon_step), math.pi)
+        by_lon = 2 * EARTH_RADIUS_KM * math.asin(
+            math.cos(max_lat) * math.sin(lon_diff / 2)
+        )
+        return min(by_lat, by_lon)
+
+    def iter_ring(self, center, radius):
+        row, col = center
+        if radius == 0:
+            yield center
+            return
+        for offset in range(-radius, radius + 1):
+            yield row - radius, col + offset
+            yield row + radius, col + offset
+        for offset in range(-radius + 1, radius):
+            yield row + offset, col - radius
+            yield row + offset, col + radius
+
+    def nearest(self, point, k, predicate=None):
+        """Вернуть до k пар (расстояние в км, значение) от ближней к дальней."""
+        if not self.cells or k <= 0:
+            return []
+        center = self.get_cell(point)
+        min_row, max_row, min_col, max_col = self.bounds
+        max_radius = max(
+            abs(center[0] - min_row), abs(center[0] - max_row),
+            abs(center[1] - min_col), abs(center[1] - max_col),
+        )
+        found = []
+        for radius in range(max_radius + 1):
+            # Дальние кольца почти пустые: дешевле перебрать занятые ячейки
+            scan_rest = 8 * radius > len(self.cells)
+            if scan_rest:
+                cells = [
+                    cell for cell in self.cells
+                    if max(abs(cell[0] - center[0]), abs(cell[1] - center[1])) >= radius
+                ]
+            else:
+                cells = self.iter_ring(center, radius)
+            for cell in cells:
+                for item_point, value in self.cells.get(cell, ()):
+                    if predicate and not predicate(value):
+                        continue
+                    distance = haversine_km(point, item_point)
+                    # id() разводит равные расстояния, не сравнивая значения
+                    heapq.heappush(found, (-distance, id(value), value))
+                    if len(found) > k:
+                        heapq.heappop(found)
+            # Всё в следующих кольцах не ближе radius ячеек от запроса
+            if scan_rest or (
+                len(found) == k
+                and -found[0][0] <= self.get_ring_distance_km(radius, point[0])
+            ):
+                break
+        return [(-distance, value) for distance, _, value in sorted(found, reverse=True)]
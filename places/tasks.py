@@ -0,0 +1,31 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+
+from places.geocoder import get_coordinates
+
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='geocoder')
+
+
+def geocode_addresses(addresses):
+    try:
+        get_coordinates(addresses)
+    except Exception:
+        logger.exception('Не удалось геокодировать адреса %s', addresses)
+    finally:
+        connection.close()
+
+
+def schedule_geocoding(*addresses):
+    """Геокодировать адреса в фоне, после коммита текущей транзакции.
+
+    Если процесс завершится раньше, адреса подберёт команда
+    `python manage.py geocode_addresses`.
+    """
+    transaction.on_commit(
+        lambda: executor.submit(geocode_addresses, addresses)
+    )
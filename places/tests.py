@@ -1,3 +1,47 @@
-from django.test import TestCase
+import random
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from .spatial import GridIndex, haversine_km
+
+
+class GridIndexTest(SimpleTestCase):
+    """Ответы GridIndex.nearest совпадают с полным перебором."""
+
+    def assert_matches_brute_force(self, center_lat, center_lon, spread):
+        rng = random.Random(center_lat)
+        points = [
+            (
+                center_lat + rng.uniform(-spread, spread),
+                center_lon + rng.uniform(-spread, spread),
+            )
+            for _ in range(400)
+        ]
+        index = GridIndex(
+            ((point, number) for number, point in enumerate(points)),
+            cell_size_km=20,
+        )
+        for _ in range(1000):
+            query = (
+                center_lat + rng.uniform(-spread, spread),
+                center_lon + rng.uniform(-spread, spread),
+            )
+            k = rng.choice([1, 3, 10])
+            expected = sorted(haversine_km(query, point) for point in points)[:k]
+            found = [distance for distance, _ in index.nearest(query, k)]
+            self.assertEqual(len(found), k)
+            for found_distance, expected_distance in zip(found, expected):
+                self.assertAlmostEqual(found_distance, expected_distance, places=6)
+
+    def test_moscow(self):
+        self.assert_matches_brute_force(55.75, 37.6, 0.5)
+
+    def test_high_latitudes(self):
+        # Разброс широт велик: у северного края ячейки заметно уже средних
+        self.assert_matches_brute_force(70, 30, 10)
+
+    def test_predicate(self):
+        points = [((55.75 + n / 100, 37.6), n) for n in range(20)]
+        index = GridIndex(points)
+        found = index.nearest((55.75, 37.6), 2, predicate=lambda n: n % 2)
+        self.assertEqual([value for _, value in found], [1, 3])
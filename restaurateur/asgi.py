@@ -0,0 +1,97 @@
+import asyncio
+from importlib import import_module
+from io import BytesIO
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.handlers.asgi import ASGIRequest
+from django.urls import reverse
+
+from .views import get_events_cursor, is_manager, stream_order_events_async
+
+
+def load_user(request):
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    user = get_user(request)
+    return user if is_manager(user) else None
+
+
+async def send_order_events(scope, receive, send):
+    """Асинхронный поток order_events_stream.
+
+    Django 3.2 умеет отдавать под ASGI только синхронные потоковые
+    ответы и крутит их прямо в event loop, поэтому поток событий
+    отдаётся здесь, в обход обработчика Django.
+    """
+    request = ASGIRequest(scope, BytesIO())
+    user = await sync_to_async(load_user)(request)
+    if user is None:
+        await send({
+            'type': 'http.response.start',
+            'status': 403,
+            'headers': [(b'content-type', b'text/plain; charset=utf-8')],
+        })
+        await send({'type': 'http.response.body', 'body': b'Forbidden'})
+        return
+
+    cursor = await sync_to_async(get_events_cursor)(request)
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            continue
+
+    disconnected = asyncio.ensure_future(wait_for_disconnect())
+    events = stream_order_events_async(cursor)
+    next_events = None
+    try:
+        while True:
+            next_events = asyncio.ensure_future(events.__anext__())
+            await asyncio.wait(
+                [next_events, disconnected],
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not next_events.done():
+                break
+            try:
+                chunk = next_events.result()
+            except StopAsyncIteration:
+                await send({'type': 'http.response.body'})
+                break
+            await send({
+                'type': 'http.response.body',
+                'body': chunk.encode('utf-8'),
+                'more_body': True,
+            })
+    finally:
+        disconnected.cancel()
+        if next_events is not None and not next_events.done():
+            next_events.cancel()
+            await asyncio.gather(next_events, return_exceptions=True)
+        await events.aclose()
+
+
+def with_order_events(application):
+    """Обернуть ASGI-приложение Django, отдав поток событий заказов
+    асинхронному обработчику."""
+    order_events_path = reverse('restaurateur:order_events')
+
+    async def router(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == order_events_path:
+            await send_order_events(scope, receive, send)
+        else:
+            await application(scope, receive, send)
+
+    return router
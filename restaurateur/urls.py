@@ -14,6 +14,9 @@ urlpatterns = [
 
     # TODO заглушка для нереализованного функционала
     path('orders/', views.view_orders, name="view_orders"),
+    path('orders/events/', views.order_events_stream, name="order_events"),
+    path('orders/advance/', views.advance_orders_automatically, name="advance_orders"),
+    path('orders/<int:order_id>/advance/', views.advance_order, name="advance_order"),
 
     path('login/', views.LoginView.as_view(), name="login"),
     path('logout/', views.LogoutView.as_view(), name="logout"),
@@ -1,21 +1,32 @@
-import requests
+import json
+import time
+from math import isnan
+
+from asgiref.sync import sync_to_async
 from django import forms
 from django.shortcuts import redirect, render
 from django.views import View
 from django.urls import reverse_lazy
+from django.contrib import messages
 from django.contrib.auth.decorators import user_passes_test
 
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
-from places.models import Place
-from django.db import transaction
-from foodcartapp.models import Product, Restaurant, Order
-from geopy.distance import geodesic
+from places.distance import distance_matrix, sort_by_distance
+from places.geocoder import get_coordinates, yandex_geocoder
 from django.conf import settings
-from django.core.exceptions import ObjectDoesNotExist
-
-
-YANDEX_API_KEY = settings.YANDEX_API_KEY
+from django.core.paginator import Paginator
+from django.db import close_old_connections
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_POST
+from foodcartapp import order_status
+from foodcartapp.caching import cached_view
+from foodcartapp.capabilities import capability_index
+from foodcartapp.events import order_events
+from foodcartapp.models import Product, Restaurant, Order
 
 
 class Login(forms.Form):
@@ -35,6 +46,74 @@ class Login(forms.Form):
     )
 
 
+def format_cursor(timestamp, order_id):
+    return '{}_{}'.format(timestamp.isoformat(), order_id)
+
+
+def parse_cursor(cursor):
+    timestamp, _, order_id = (cursor or '').rpartition('_')
+    timestamp = parse_datetime(timestamp)
+    if timestamp is None or not order_id.isdigit():
+        return None
+    return timestamp, int(order_id)
+
+
+class OrderFilter(forms.Form):
+    ACTIVE_STATUSES = [
+        Order.StatusCheck.CREATED,
+        Order.StatusCheck.IN_PROGRESS,
+        Order.StatusCheck.IN_KITCHEN,
+        Order.StatusCheck.KICTHEN_PREPARATION,
+        Order.StatusCheck.DELIVERED_TO_COURIER,
+        Order.StatusCheck.IN_TRANSIT,
+        Order.StatusCheck.DELIVERED,
+    ]
+
+    status = forms.MultipleChoiceField(
+        label='Статус', required=False,
+        choices=Order.StatusCheck.choices,
+    )
+    payment = forms.ChoiceField(
+        label='Способ оплаты', required=False,
+        choices=[('', 'Любой')] + Order.PaymentType.choices,
+    )
+    restaurant = forms.ModelChoiceField(
+        label='Ресторан', required=False,
+        queryset=Restaurant.objects.order_by('name'),
+        empty_label='Любой',
+    )
+    cursor = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    def clean_cursor(self):
+        cursor = self.cleaned_data['cursor']
+        if not cursor:
+            return None
+        parsed_cursor = parse_cursor(cursor)
+        if parsed_cursor is None:
+            raise forms.ValidationError('Некорректный курсор')
+        return parsed_cursor
+
+    def filter_orders(self, orders):
+        filters = self.cleaned_data
+        orders = orders.filter(
+            status__in=filters['status'] or self.ACTIVE_STATUSES
+        )
+        if filters['payment']:
+            orders = orders.filter(payment=filters['payment'])
+        if filters['restaurant']:
+            orders = orders.filter(restaurant=filters['restaurant'])
+        if filters['cursor']:
+            orders = orders.registered_before(*filters['cursor'])
+        return orders.order_by('-registered_at', '-id')
+
+
+class RestaurantFilter(forms.Form):
+    restaurant = forms.ModelMultipleChoiceField(
+        label='Рестораны', required=False,
+        queryset=Restaurant.objects.order_by('name'),
+    )
+
+
 class LoginView(View):
     def get(self, request, *args, **kwargs):
         form = Login()
@@ -70,63 +149,92 @@ def is_manager(user):
     return user.is_staff
 
 
-def fetch_coordinates(apikey, address):
-    base_url = "https://geocode-maps.yandex.ru/1.x"
-    response = requests.get(base_url, params={
-        "geocode": address,
-        "apikey": apikey,
-        "format": "json",
-    })
-    response.raise_for_status()
-    found_places = response.json()['response']['GeoObjectCollection']['featureMember']
-
-    if not found_places:
-        return None
-
-    most_relevant = found_places[0]
-    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
-    return lon, lat
-
-
-def calculate_distance(delivery_coords, restaurant_coords):
-    restaurant_coords = fetch_coordinates(YANDEX_API_KEY, restaurant_coords)
-    delivery_coords = fetch_coordinates(YANDEX_API_KEY, delivery_coords)
-    if delivery_coords is None or restaurant_coords is None:
-        return None
-    return geodesic(restaurant_coords, delivery_coords).km
+def redirect_back(request):
+    next_url = request.POST.get('next')
+    if next_url and url_has_allowed_host_and_scheme(
+        url=next_url,
+        allowed_hosts={request.get_host()},
+        require_https=request.is_secure()
+    ):
+        return redirect(next_url)
+    return redirect('restaurateur:view_orders')
+
+
+def attach_restaurant_distances(orders):
+    restaurants = list({
+        restaurant.id: restaurant
+        for order in orders
+        for restaurant in order.available_restaurants
+    }.values())
+    coordinates = get_coordinates(
+        [order.address for order in orders]
+        + [restaurant.address for restaurant in restaurants],
+        fetch_missing=False,
+    )
+    distances = distance_matrix(
+        [coordinates.get(order.address) for order in orders],
+        [coordinates.get(restaurant.address) for restaurant in restaurants],
+    )
+    restaurant_columns = {
+        restaurant.id: column for column, restaurant in enumerate(restaurants)
+    }
+    sorted_columns = sort_by_distance(distances, [
+        [restaurant_columns[restaurant.id] for restaurant in order.available_restaurants]
+        for order in orders
+    ])
+    for row, (order, columns) in enumerate(zip(orders, sorted_columns)):
+        order.available_restaurants = []
+        for column in columns:
+            distance = distances[row, column]
+            order.available_restaurants.append({
+                "distance": None if isnan(distance) else round(float(distance), 3),
+                "name": restaurants[column].name,
+            })
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
+@cached_view('menu')
 def view_products(request):
-    restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
-
+    restaurant_filter = RestaurantFilter(request.GET)
+    restaurants = Restaurant.objects.order_by('name')
+    if restaurant_filter.is_valid() and restaurant_filter.cleaned_data['restaurant']:
+        restaurants = restaurant_filter.cleaned_data['restaurant']
+    restaurants = list(restaurants)
+
+    products = Paginator(
+        Product.objects.select_related('category').order_by('id'),
+        settings.MANAGER_PRODUCTS_PAGE_SIZE,
+    ).get_page(request.GET.get('page'))
+
+    product_restaurants = capability_index.snapshot().product_restaurants
     products_with_restaurant_availability = []
     for product in products:
-        availability = {
-            item.restaurant_id: item.availability
-            for item in product.menu_items.all()
-        }
+        restaurants_mask = product_restaurants.get(product.id, 0)
         ordered_availability = [
-            availability.get(restaurant.id, False)
+            bool(restaurants_mask >> restaurant.id & 1)
             for restaurant in restaurants
         ]
-
         products_with_restaurant_availability.append(
             (product, ordered_availability)
         )
 
+    page_params = request.GET.copy()
+    page_params.pop('page', None)
     return render(
         request,
         template_name="products_list.html",
         context={
             'products_with_restaurant_availability': products_with_restaurant_availability,
             'restaurants': restaurants,
+            'restaurant_filter': restaurant_filter,
+            'products_page': products,
+            'page_params': page_params.urlencode(),
         }
     )
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
+@cached_view('restaurants')
 def view_restaurants(request):
     return render(request, template_name="restaurants_list.html", context={
         'restaurants': Restaurant.objects.all(),
@@ -135,54 +243,165 @@ def view_restaurants(request):
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
+    order_filter = OrderFilter(request.GET)
+    if not order_filter.is_valid():
+        order_filter = OrderFilter({})
+        order_filter.is_valid()
+
+    # Курсор берётся до выборки страницы: заказы, изменённые, пока она
+    # собирается, придут в потоке событий
+    events_cursor = get_current_events_cursor()
+    page_size = settings.MANAGER_ORDERS_PAGE_SIZE
+    order_items = list(
+        order_filter.filter_orders(Order.objects.all()).prefetch_related(
+            'orders__product'
+        ).select_related("restaurant")[:page_size + 1]
+        .get_restaurants_for_order()
+    )
+    next_page_url = None
+    if len(order_items) > page_size:
+        order_items = order_items[:page_size]
+        last_order = order_items[-1]
+        next_page_params = request.GET.copy()
+        next_page_params['cursor'] = format_cursor(
+            last_order.registered_at, last_order.id
+        )
+        next_page_url = '?{}'.format(next_page_params.urlencode())
 
-    order_items = Order.objects.filter(
-        status__in=["CR", "IP", "IK", "KP", "DTC", "IT", "DE"]
-    ).final_price().prefetch_related(
-        'orders__product'
-        ).select_related("restaurant").get_restaurants_for_order()
-    with transaction.atomic():
-        for order in order_items:
-            new_status = None
-            if order.status == "IP" and order.restaurant:
-                new_status = "IK"
-            elif order.status == "IK" and order.restaurant:
-                new_status = "KP"
-            elif order.status == "KP" and order.restaurant:
-                new_status = "DTC"
-
-            restaurant_dist = []
-            for restaurant in order.available_restaurants:
-                try:
-                    order_place = Place.objects.get(
-                        address=order.address
-                    )
-                    restaurant_place = Place.objects.get(
-                        address=restaurant.address
-                    )
-                except ObjectDoesNotExist:
-                    break
-                distance = calculate_distance(
-                    order_place.address, restaurant_place.address
-                )
-                if distance is None:
-                    order.available_restaurants = None
-                    break
-                restaurant_dist.append(
-                    {
-                        "distance": round(distance, 3),
-                        "restaurant": restaurant.name
-                    }
-                )
-            order.available_restaurants = sorted(
-                restaurant_dist, key=lambda x: ["distance"]
-            )
-
-        if new_status:
-            order.status = new_status
-            order.save()
+    attach_restaurant_distances(order_items)
+    for order in order_items:
+        order.next_status_display = get_next_status_display(order)
 
     return render(request, template_name='order_items.html', context={
         'order_items': order_items,
+        'order_filter': order_filter,
+        'next_page_url': next_page_url,
+        'events_cursor': format_cursor(*events_cursor),
+        'geocoder_unavailable': yandex_geocoder.breaker.is_open,
         }
     )
+
+
+def get_current_events_cursor():
+    return Order.objects.last_update() or (timezone.now(), 0)
+
+
+def get_next_status_display(order):
+    next_status = order_status.NEXT_STATUS.get(order.status)
+    return Order.StatusCheck(next_status).label if next_status else None
+
+
+def serialize_order_event(order):
+    return {
+        'id': order.id,
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'next_status_display': get_next_status_display(order),
+        'payment_display': order.get_payment_display(),
+        'total_price': str(order.total_price),
+        'client': f'{order.firstname} {order.lastname}',
+        'phonenumber': str(order.phonenumber),
+        'address': order.address,
+        'restaurant': order.restaurant.name if order.restaurant else None,
+        'comment': order.comment,
+    }
+
+
+def read_order_events(cursor):
+    """Вернуть SSE-события о заказах, изменённых после курсора, и новый курсор."""
+    orders = (
+        Order.objects.updated_after(*cursor)
+        .select_related('restaurant')
+        .order_by('updated_at', 'id')[:100]
+    )
+    events = []
+    for order in orders:
+        cursor = (order.updated_at, order.id)
+        events.append('id: {}\nevent: order\ndata: {}\n\n'.format(
+            format_cursor(*cursor),
+            json.dumps(serialize_order_event(order), ensure_ascii=False),
+        ))
+    # Пустой комментарий не даёт прокси закрыть простаивающее соединение
+    events.append(': ping\n\n')
+    return ''.join(events), cursor
+
+
+def stream_order_events(cursor):
+    """Поток событий для WSGI: держит поток воркера, пока открыт."""
+    deadline = time.monotonic() + settings.ORDER_EVENTS_STREAM_TIMEOUT
+    version = order_events.version
+    yield 'retry: 3000\n\n'
+    while time.monotonic() < deadline:
+        events, cursor = read_order_events(cursor)
+        yield events
+        version = order_events.wait(
+            version, timeout=settings.ORDER_EVENTS_POLL_INTERVAL
+        )
+    close_old_connections()
+
+
+async def stream_order_events_async(cursor):
+    """Поток событий для ASGI: база читается в потоке, ожидание не
+    блокирует event loop."""
+    deadline = time.monotonic() + settings.ORDER_EVENTS_STREAM_TIMEOUT
+    version = order_events.version
+    yield 'retry: 3000\n\n'
+    try:
+        while time.monotonic() < deadline:
+            events, cursor = await sync_to_async(read_order_events)(cursor)
+            yield events
+            version = await order_events.wait_async(
+                version, timeout=settings.ORDER_EVENTS_POLL_INTERVAL
+            )
+    finally:
+        await sync_to_async(close_old_connections)()
+
+
+def get_events_cursor(request):
+    """Курсор берётся из Last-Event-ID (его шлёт переподключившийся
+    EventSource) или из ?cursor=, иначе поток начинается с последнего
+    изменённого заказа."""
+    return parse_cursor(
+        request.headers.get('Last-Event-ID') or request.GET.get('cursor')
+    ) or get_current_events_cursor()
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def order_events_stream(request):
+    """Server-sent events с заказами, изменёнными после курсора.
+
+    Под WSGI каждое открытое соединение занимает поток воркера, так что
+    воркеру нужны потоки (gunicorn --threads). Под ASGI этот путь
+    перехватывает restaurateur.asgi и отдаёт асинхронный поток.
+    """
+    response = StreamingHttpResponse(
+        stream_order_events(get_events_cursor(request)),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_POST
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def advance_order(request, order_id):
+    try:
+        advanced = order_status.advance(
+            Order.objects.filter(pk=order_id), request.POST.get('status')
+        )
+    except order_status.TransitionError:
+        return HttpResponseBadRequest('Недопустимый переход статуса')
+    if not advanced:
+        messages.warning(
+            request,
+            f'Заказ {order_id} не продвинут: его статус уже изменился',
+        )
+    return redirect_back(request)
+
+
+@require_POST
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def advance_orders_automatically(request):
+    order_status.advance_automatically()
+    return redirect_back(request)
@@ -0,0 +1,18 @@
+"""
+ASGI config for Django project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "star_burger.settings")
+django_application = get_asgi_application()
+
+from restaurateur.asgi import with_order_events  # noqa: E402
+
+application = with_order_events(django_application)
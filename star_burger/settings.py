@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 import dj_database_url
 
@@ -15,6 +16,15 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 SECRET_KEY = env('SECRET_KEY')
 DEBUG = env('DEBUG')
 YANDEX_API_KEY = env('YANDEX_API_KEY')
+GEOCODER = env('GEOCODER', 'places.geocoder.fetch_yandex_coordinates')
+GEOCODER_CONCURRENCY = env.int('GEOCODER_CONCURRENCY', 8)
+GEOCODER_RATE_LIMIT = env.float('GEOCODER_RATE_LIMIT', 20)
+MANAGER_ORDERS_PAGE_SIZE = env.int('MANAGER_ORDERS_PAGE_SIZE', 50)
+# Сколько ближайших ресторанов предлагать при назначении заказа
+ORDER_DISPATCH_CHOICES = env.int('ORDER_DISPATCH_CHOICES', 10)
+MANAGER_PRODUCTS_PAGE_SIZE = env.int('MANAGER_PRODUCTS_PAGE_SIZE', 100)
+ORDER_EVENTS_POLL_INTERVAL = env.float('ORDER_EVENTS_POLL_INTERVAL', 5)
+ORDER_EVENTS_STREAM_TIMEOUT = env.float('ORDER_EVENTS_STREAM_TIMEOUT', 300)
 
 ALLOWED_HOSTS = env.list('ALLOWED_HOSTS')
 
@@ -83,12 +93,45 @@ WSGI_APPLICATION = 'star_burger.wsgi.application'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Уменьшенные копии картинок товаров: название -> (ширина, высота)
+PRODUCT_THUMBNAIL_SIZES = {
+    'small': (100, 100),
+    'medium': (400, 400),
+}
+PRODUCT_THUMBNAIL_QUALITY = 80
+
+# Ограничения для optimize_product_images и файл с хэшами уже пережатых картинок
+PRODUCT_IMAGE_MAX_SIZE = (1600, 1600)
+PRODUCT_IMAGE_QUALITY = 85
+PRODUCT_IMAGES_MANIFEST = os.path.join(MEDIA_ROOT, 'optimized_images.json')
+
 DATABASES = {
     'default': dj_database_url.config(
         default='sqlite:////{0}'.format(os.path.join(BASE_DIR, 'db.sqlite3'))
     )
 }
 
+CACHES = {
+    'default': {
+        # По умолчанию кэш на диске: он общий для всех воркеров машины, и
+        # сброс кэша из одного процесса виден остальным
+        **env.dj_cache_url('CACHE_URL', 'file://{}'.format(
+            os.path.join(tempfile.gettempdir(), 'star_burger_cache')
+        )),
+        'KEY_PREFIX': 'star_burger',
+        'VERSION': env.int('CACHE_VERSION', 1),
+    }
+}
+# Файловый и locmem-кэш при переполнении удаляют случайную треть записей,
+# а штатных 300 записей едва хватает на страницы с разными GET-параметрами
+if CACHES['default']['BACKEND'].endswith(('.FileBasedCache', '.LocMemCache')):
+    CACHES['default'].setdefault('OPTIONS', {}).setdefault(
+        'MAX_ENTRIES', env.int('CACHE_MAX_ENTRIES', 10000)
+    )
+CACHE_VIEW_TIMEOUT = env.int('CACHE_VIEW_TIMEOUT', 10 * 60)
+CATALOG_CACHE_TIMEOUT = env.int('CATALOG_CACHE_TIMEOUT', 10 * 60)
+BANNERS_CACHE_TIMEOUT = env.int('BANNERS_CACHE_TIMEOUT', 60 * 60)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -115,6 +158,10 @@ USE_L10N = True
 USE_TZ = True
 
 STATIC_URL = '/static/'
+STATICFILES_STORAGE = 'star_burger.staticfiles.CompressedManifestStaticFilesStorage'
+
+BANNERS_MANIFEST = env('BANNERS_MANIFEST', os.path.join(BASE_DIR, 'banners_manifest.json'))
+BANNERS_CACHE_MAX_AGE = env.int('BANNERS_CACHE_MAX_AGE', 24 * 60 * 60)
 
 INTERNAL_IPS = [
     '127.0.0.1'
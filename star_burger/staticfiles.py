@@ -0,0 +1,83 @@
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage, staticfiles_storage
+)
+from django.core.files.base import ContentFile
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.functional import cached_property
+from django.views.static import serve
+
+from foodcartapp.responses import compress
+
+
+# Суффиксы сжатых копий в порядке предпочтения при отдаче
+ENCODING_SUFFIXES = {
+    'br': '.br',
+    'gzip': '.gz',
+}
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хэшем содержимого в имени и заранее сжатыми копиями.
+
+    После того как collectstatic разложил файлы с хэшами, рядом с каждым
+    текстовым файлом кладутся .gz и, если установлен brotli, .br — когда
+    сжатие действительно уменьшает файл.
+    """
+
+    compressible_extensions = (
+        '.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.ico',
+    )
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in set(self.hashed_files.values()):
+            if hashed_name.endswith(self.compressible_extensions):
+                self.write_compressed(hashed_name)
+        self.__dict__.pop('immutable_names', None)
+
+    def write_compressed(self, name):
+        # Имя с хэшем однозначно задаёт содержимое, так что сжатые
+        # копии с прошлых запусков годятся как есть
+        if self.exists(name + ENCODING_SUFFIXES['gzip']):
+            return
+        with self.open(name) as original:
+            content = original.read()
+        for encoding, compressed in compress(content).items():
+            compressed_name = name + ENCODING_SUFFIXES[encoding]
+            if len(compressed) < len(content) * 0.95:
+                self.delete(compressed_name)
+                self._save(compressed_name, ContentFile(compressed))
+
+    @cached_property
+    def immutable_names(self):
+        return frozenset(self.hashed_files.values())
+
+
+def serve_static(request, path):
+    """Отдать файл из STATIC_ROOT, выбрав сжатую копию по Accept-Encoding.
+
+    Файлы с хэшем в имени кэшируются клиентом на год без перепроверок.
+    """
+    accept_encoding = request.headers.get('Accept-Encoding', '')
+    served_path = path
+    for encoding, suffix in ENCODING_SUFFIXES.items():
+        if encoding in accept_encoding and os.path.isfile(
+            safe_join(settings.STATIC_ROOT, path + suffix)
+        ):
+            served_path = path + suffix
+            break
+    response = serve(request, served_path, document_root=settings.STATIC_ROOT)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if path in staticfiles_storage.immutable_names:
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
+        )
+    return response
@@ -20,12 +20,14 @@ from django.urls import path, include
 from django.shortcuts import render
 
 from . import settings
+from .staticfiles import serve_static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', render, kwargs={'template_name': 'index.html'}, name='start_page'),
     path('api/', include('foodcartapp.urls')),
     path('manager/', include('restaurateur.urls')),
+    path(settings.STATIC_URL.lstrip('/') + '<path:path>', serve_static),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
 if settings.DEBUG: